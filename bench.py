@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+"""
+charmos docs pipeline benchmarks
+────────────────────────────────
+Offline micro-benchmarks for the make_json / make_md hot paths, run
+against synthetic headers so no charmos checkout is needed.
+
+Usage:
+  bench.py refs [--ideas 200]
+  bench.py parse [DIR ...] [--files 200]
+  bench.py engines [DIR ...] [--files 200]
+  bench.py incremental [DIR ...] [--files 50] [--edits 20]
+  bench.py idearefs [--titles 2000] [--ideas 500] [--refs 8]
+  bench.py suite [--sizes 100 1000 10000] [--jobs N] [--out FILE]
+  bench.py compare BASE.json NEW.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent
+
+# `suite` defaults: corpus sizes in files, and per-file declaration counts
+# roughly matching an average charmos header.
+SUITE_SIZES  = (100, 1000, 10000)
+SUITE_COUNTS = {"structs": 12, "fn_ptrs": 4, "macros": 6, "ideas": 1}
+SUITE_OUT    = REPO_DIR / "bench_results"
+
+# Headers per include/ subdirectory; every SUITE_C_EVERY-th file is a
+# kernel/ .c source instead.
+SUITE_DIR_FILES = 20
+SUITE_C_EVERY   = 10
+
+
+# ── Synthetic sources ─────────────────────────────────────────────────────────
+
+def synth_idea_header(n_ideas: int, code_lines: int = 20) -> str:
+    """A header of n_ideas @idea blocks, each followed by some referencing code."""
+    out = ["/* @title: Synthetic */", "#include <stdint.h>", ""]
+    for i in range(n_ideas):
+        out += [
+            f"/* @idea:small Idea {i} */",
+            "/*",
+            " * # Small Idea",
+            f" * Idea {i} (STABLE)",
+            " *",
+            " * ## Overview",
+            f" * Calls `fn_{i}()` and `fn_{i + 1}()`, see `file_{i}.c`.",
+            " */",
+        ]
+        for j in range(code_lines):
+            out.append(f"int fn_{i}_{j}(int x); /* `fn_{i}_{j}()` in sub/file_{j}.h */")
+        out.append("")
+    return "\n".join(out) + "\n"
+
+
+def synth_c_source(idx: int, n_decls: int = 40) -> str:
+    """A kernel-style header: structs with nested unions, enums, typedefs, macros, functions."""
+    out = [f"/* @title: Synthetic {idx} */", "#include <stdint.h>", ""]
+    for i in range(n_decls):
+        out += [
+            f"#define S{idx}_{i}_FLAG(x) \\",
+            f"    ((x) << {i % 32})",
+            f"struct s{idx}_{i} {{",
+            "    uint64_t id;",
+            "    union {",
+            "        struct { uint32_t lo, hi; } half;",
+            "        void (*cb)(struct s_any *, int);",
+            "    } u;",
+            "    struct list_head link;",
+            "};",
+            f"typedef struct s{idx}_{i} s{idx}_{i}_t;",
+            f"enum e{idx}_{i} {{ E{idx}_{i}_A, E{idx}_{i}_B = 4, E{idx}_{i}_C }};",
+            f"static inline int s{idx}_{i}_get(struct s{idx}_{i} *s, enum e{idx}_{i} e) {{",
+            "    if (s->u.half.lo) { return (int) e; }",
+            "    for (int k = 0; k < 4; k++) { s->id += k; }",
+            "    return 0;",
+            "}",
+            "",
+        ]
+    return "\n".join(out) + "\n"
+
+
+def synth_corpus_file(idx: int, n_files: int, structs: int, fn_ptrs: int,
+                      macros: int, ideas: int) -> str:
+    """
+    One charmos-style source: @idea blocks referencing the functions,
+    headers and titles of neighbouring files, multi-line macros, function-pointer typedefs,
+    structs with nested anonymous unions/structs (some members typed with
+    those typedefs or a neighbour's structs) and prototypes.
+    """
+    prev, nxt = (idx - 1) % n_files, (idx + 1) % n_files
+    out = [f"/* @title: Synthetic {idx} */", "#pragma once", "#include <stdint.h>", ""]
+
+    for i in range(ideas):
+        out += [
+            f"/* @idea:big Component {idx} part {i} */",
+            "/*",
+            " * # Big Idea",
+            f" * Component {idx} Part {i} (STABLE)",
+            " *",
+            " * ## Overview",
+            f" * Uses `f{idx}_0()` and `f{nxt}_0()`, laid out in `h{prev}.h`.",
+            f" * Builds on [prev]: \"Synthetic {prev}\", fixes #{idx + 1}.",
+            " *",
+            " * > warning Not reentrant",
+            " *",
+            " * ## Changelog",
+            " *   - first",
+            " */",
+            "",
+        ]
+
+    for i in range(macros):
+        out += [
+            f"#define M{idx}_{i}(x, y) \\",
+            f"    do {{ (x) += (y) << {i % 32}; \\",
+            "         (y) = 0; } while (0)",
+        ]
+    out.append("")
+
+    for i in range(fn_ptrs):
+        out.append(f"typedef int (*fp{idx}_{i}_t)(struct c{idx}_{i % max(structs, 1)} *, "
+                   f"uint64_t);")
+    out.append("")
+
+    for i in range(structs):
+        out += [
+            f"struct c{idx}_{i} {{",
+            "    uint64_t id;",
+            "    union {",
+            "        uint64_t raw;",
+            "        struct {",
+            "            uint32_t lo;",
+            "            uint32_t hi;",
+            "        };",
+            f"        void (*cb)(struct c{idx}_{i} *, int);",
+            "    };",
+            f"    struct c{prev}_{i} *peer;",
+        ]
+        if fn_ptrs:
+            out.append(f"    fp{idx}_{i % fn_ptrs}_t handler;")
+        out += ["};", ""]
+
+    for i in range(max(structs, 1)):
+        out.append(f"int f{idx}_{i}(struct c{idx}_{i} *c, uint64_t flags);")
+    return "\n".join(out) + "\n"
+
+
+def write_synth_corpus(root: Path, n_files: int, **counts) -> list[Path]:
+    """
+    Write n_files synth_corpus_file() sources under root/charmos the way a
+    checkout is laid out and return their paths relative to root, which is
+    how generate.py (run from root) names them.
+    """
+    files = []
+    for idx in range(n_files):
+        sub = f"d{idx // SUITE_DIR_FILES}"
+        if idx % SUITE_C_EVERY == SUITE_C_EVERY - 1:
+            rel = Path("charmos/kernel") / sub / f"s{idx}.c"
+        else:
+            rel = Path("charmos/include") / sub / f"h{idx}.h"
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_text(synth_corpus_file(idx, n_files, **counts), encoding="utf-8")
+        files.append(rel)
+    return files
+
+
+def _time(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+# ── Benchmarks ────────────────────────────────────────────────────────────────
+
+def bench_refs(max_ideas: int):
+    """
+    extract_ideas_from_file on headers with a growing number of @idea
+    blocks.  Each idea's references cover all the code after it, so the
+    output itself grows with ideas × file size; what must stay flat is the
+    time per emitted reference.  The old per-idea char_to_line table and
+    rescan made that grow with the file size too.
+    """
+    import make_json
+
+    sizes = []
+    n = max(max_ideas // 8, 1)
+    while n < max_ideas:
+        sizes.append(n)
+        n *= 2
+    sizes.append(max_ideas)
+
+    print(f"{'ideas':>8}{'file size':>12}{'refs out':>10}{'time':>12}{'per ref':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = Path(tmp) / f"ideas_{n}.h"
+            path.write_text(synth_idea_header(n), encoding="utf-8")
+            elapsed = _time(lambda: make_json.extract_ideas_from_file(path))
+            refs = sum(
+                len(idea["references"]["functions"]) + len(idea["references"]["files"])
+                for idea in make_json.extract_ideas_from_file(path)
+            )
+            size_kb = path.stat().st_size / 1024
+            print(f"{n:>8}{size_kb:>10.0f}KB{refs:>10}{elapsed * 1000:>10.1f}ms"
+                  f"{elapsed / max(refs, 1) * 1e9:>8.0f}ns")
+
+
+def _c_sources(dirs, n_files: int, tmp: str):
+    """Every .c/.h under dirs, or n_files synthetic sources written to tmp."""
+    if dirs:
+        return [p for d in dirs for p in sorted(Path(d).rglob("*"))
+                if p.suffix in (".c", ".h") and p.is_file()]
+    files = []
+    for i in range(n_files):
+        path = Path(tmp) / f"synth_{i}.h"
+        path.write_text(synth_c_source(i), encoding="utf-8")
+        files.append(path)
+    return files
+
+
+def bench_parse(dirs, n_files: int):
+    """
+    parse_c_types_and_functions over every .c/.h under dirs, or over
+    n_files synthetic kernel-style sources when no directory is given.
+    Run it from an older checkout (PYTHONPATH=...) to compare walkers.
+    """
+    import make_json
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = _c_sources(dirs, n_files, tmp)
+
+        # Parse once so the grammar is loaded before timing.
+        for path in files[:1]:
+            make_json.parse_c_types_and_functions(str(path))
+
+        def run():
+            for path in files:
+                make_json.parse_c_types_and_functions(str(path))
+
+        elapsed = _time(run)
+        size_mb = sum(p.stat().st_size for p in files) / 1e6
+        print(f"{len(files)} files, {size_mb:.1f}MB: {elapsed * 1000:.0f}ms "
+              f"({elapsed / max(len(files), 1) * 1000:.2f}ms/file)")
+
+
+def bench_engines(dirs, n_files: int) -> int:
+    """
+    Run every make_json.C_PARSE_ENGINES engine over the same parse trees,
+    check that they produce byte-identical c_parse JSON for every file and
+    time each one.  Returns the number of files that differ.
+    """
+    import json
+    import make_json
+
+    with tempfile.TemporaryDirectory() as tmp:
+        trees = [(p, *make_json.read_source(p)) for p in _c_sources(dirs, n_files, tmp)]
+
+    engines = make_json.C_PARSE_ENGINES
+    mismatches = 0
+    for path, code, tree in trees:
+        outs = {name: json.dumps(fn(tree.root_node, code), ensure_ascii=False)
+                for name, fn in engines.items()}
+        if len(set(outs.values())) != 1:
+            mismatches += 1
+            print(f"MISMATCH {path}")
+
+    print(f"{len(trees)} files, {mismatches} mismatches")
+    for name, fn in engines.items():
+        def run():
+            for _, code, tree in trees:
+                fn(tree.root_node, code)
+        print(f"  {name:<8}{_time(run) * 1000:>8.0f}ms")
+    return mismatches
+
+
+def bench_incremental(dirs, n_files: int, n_edits: int) -> int:
+    """
+    Apply random line edits (insert, delete, change) to copies of each
+    source, re-read them with make_json.IncrementalParser and check every
+    result against a from-scratch build_file_record().  Prints the mean
+    latency of both.  Returns the number of mismatching edits.
+    """
+    import json
+    import random
+    import make_json
+
+    rng = random.Random(0)
+    mismatches = 0
+    full_t = inc_t = 0.0
+    edits = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = _c_sources(dirs, n_files, tmp)
+        work = Path(tmp) / "work"
+        work.mkdir()
+        for i, src in enumerate(sources):
+            path = work / f"{i}{src.suffix}"
+            lines = src.read_text(encoding="utf-8").splitlines(keepends=True)
+            path.write_text("".join(lines), encoding="utf-8")
+            inc = make_json.IncrementalParser()
+            inc.parse(path)
+
+            for _ in range(n_edits):
+                at = rng.randrange(len(lines) + 1)
+                op = rng.choice(("insert", "delete", "change"))
+                if op == "insert" or not lines or at == len(lines):
+                    lines.insert(at, rng.choice((
+                        "\n", "int added_global;\n", "struct added { int a; };\n",
+                        "/* note */\n", "#define ADDED 1\n",
+                    )))
+                elif op == "delete":
+                    del lines[at]
+                else:
+                    lines[at] = lines[at].replace("int", "long", 1)
+                path.write_text("".join(lines), encoding="utf-8")
+
+                t0 = time.perf_counter()
+                got = inc.parse(path)
+                inc_t += time.perf_counter() - t0
+                t0 = time.perf_counter()
+                want = make_json.build_file_record(path)
+                full_t += time.perf_counter() - t0
+                edits += 1
+
+                if json.dumps(got) != json.dumps(want):
+                    mismatches += 1
+                    print(f"MISMATCH {src} after {op} at line {at + 1}")
+
+    print(f"{len(sources)} files, {edits} edits, {mismatches} mismatches")
+    print(f"  full parse   {full_t / max(edits, 1) * 1000:>7.2f}ms/edit")
+    print(f"  incremental  {inc_t / max(edits, 1) * 1000:>7.2f}ms/edit")
+    return mismatches
+
+
+def bench_idearefs(n_titles: int, n_ideas: int, n_refs: int):
+    """
+    Idea-reference linking for n_ideas bodies of n_refs references each,
+    against n_titles file titles and as many idea names: the per-reference
+    scan of every name plus one re.sub per reference, against the
+    per-build ref table + IdeaRefLinker.
+    """
+    import random
+    import re
+    import make_md
+
+    rng = random.Random(0)
+    titles = {f"subsystem {i} design": f"include/sub{i}/core.h" for i in range(n_titles)}
+    names = {f"idea number {i} for subsystem": f"include/idea{i}.h" for i in range(n_titles)}
+    ideas = []
+    for i in range(n_ideas):
+        picks = rng.sample(range(n_titles), n_refs)
+        strings = [f"Subsystem {j} Design" if k % 2 else f"Idea Number {j}"
+                   for k, j in enumerate(picks)]
+        body = "\n".join(f"Builds on [r{k}]: \"{s}\" and [x](y) {s}." for k, s in enumerate(strings))
+        ideas.append({"body": body,
+                      "references": {"idea_refs": [{"string": s} for s in strings]}})
+
+    def linear(idea):
+        md = idea["body"]
+        for ref in idea["references"]["idea_refs"]:
+            ref_lower = ref["string"].lower()
+            target = next((p for n, p in names.items() if ref_lower in n), None)
+            target = target or titles.get(ref_lower)
+            if target:
+                link = f"[{ref['string']}]({make_md.generate_github_link_safe(target)})"
+                md = re.sub(re.escape(ref["string"]), link, md)
+        return md
+
+    def automaton():
+        table = make_md.build_idea_ref_table(ideas, names, titles)
+        linker = make_md.IdeaRefLinker(table)
+        return [linker.embed(idea["body"], idea, table) for idea in ideas]
+
+    t_linear = _time(lambda: [linear(idea) for idea in ideas], repeat=1)
+    t_auto = _time(automaton)
+    print(f"{n_ideas} ideas × {n_refs} refs, {n_titles} titles + {n_titles} idea names")
+    print(f"  per-ref scan   {t_linear * 1000:>8.1f}ms")
+    print(f"  automaton      {t_auto * 1000:>8.1f}ms  ({t_linear / t_auto:.1f}x, incl. build)")
+
+
+def _git_commit() -> tuple:
+    """(HEAD sha, whether the worktree has uncommitted changes), or (None, None)."""
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return sha, bool(dirty)
+
+
+def bench_suite(sizes, counts: dict, jobs: int, out: Path, pipeline: bool = True) -> int:
+    """
+    For every corpus size, write a synthetic checkout to a temporary
+    directory and time, each once over every file:
+
+      parse_c_types_and_functions   make_json's C declaration pass
+      extract_ideas_from_file       make_json's @idea pass
+      build_file_record             both, sharing one parse (what generate.py runs)
+      generate_docs                 make_md over those records, `jobs` workers
+      pipeline                      `generate.py --no-cache -j jobs` end to end
+
+    Results go to `out` as JSON, tagged with the commit they were measured
+    at, for `bench.py compare`.  Returns 1 if a pipeline run failed.
+    """
+    import make_json
+    import make_md
+
+    commit, dirty = _git_commit()
+    result = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "jobs": jobs,
+        "counts": counts,
+        "sizes": {},
+    }
+
+    stages = ["parse_c_types_and_functions", "extract_ideas_from_file",
+              "build_file_record", "generate_docs"] + (["pipeline"] if pipeline else [])
+    print(f"{'files':>7}{'size':>9}" + "".join(f"{name[:14]:>16}" for name in stages))
+
+    failed = 0
+    cwd = os.getcwd()
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            files = write_synth_corpus(root, n, **counts)
+            size = sum((root / f).stat().st_size for f in files)
+            timings = {}
+            os.chdir(root)
+            try:
+                # Load the grammar before timing
+                make_json.parse_c_types_and_functions(str(files[0]))
+
+                timings["parse_c_types_and_functions"] = _time(
+                    lambda: [make_json.parse_c_types_and_functions(str(f)) for f in files], 1)
+                timings["extract_ideas_from_file"] = _time(
+                    lambda: [make_json.extract_ideas_from_file(f) for f in files], 1)
+
+                recs = []
+                timings["build_file_record"] = _time(
+                    lambda: recs.extend(make_json.build_file_record(f) for f in files), 1)
+
+                for fn in make_md._TYPE_CACHES.values():
+                    fn.cache_clear()
+                timings["generate_docs"] = _time(
+                    lambda: make_md.generate_docs(make_md.Corpus(recs), jobs=jobs,
+                                              progress=lambda: None), 1)
+                recs.clear()
+                shutil.rmtree(make_md.DOCS_ROOT)
+
+                if pipeline:
+                    t0 = time.perf_counter()
+                    proc = subprocess.run(
+                        [sys.executable, str(REPO_DIR / "generate.py"), "--no-cache",
+                         "-j", str(jobs)],
+                        cwd=root, capture_output=True, text=True,
+                    )
+                    timings["pipeline"] = time.perf_counter() - t0
+                    if proc.returncode != 0:
+                        failed = 1
+                        print(f"pipeline failed on {n} files:\n{proc.stdout[-2000:]}{proc.stderr}")
+            finally:
+                os.chdir(cwd)
+
+        result["sizes"][str(n)] = {"files": n, "bytes": size, "seconds": timings}
+        print(f"{n:>7}{size / 1e6:>7.1f}MB"
+              + "".join(f"{timings.get(name, float('nan')):>15.2f}s" for name in stages))
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=1), encoding="utf-8")
+    print(f"results written to {out}")
+    return failed
+
+
+def bench_compare(base: Path, new: Path):
+    """Per-size, per-stage timings of two `suite` result files side by side."""
+    a = json.loads(base.read_text(encoding="utf-8"))
+    b = json.loads(new.read_text(encoding="utf-8"))
+
+    def label(r):
+        sha = (r.get("commit") or "unknown")[:10]
+        return sha + ("+dirty" if r.get("dirty") else "")
+
+    print(f"base {label(a)}  ({a['created']}, jobs={a['jobs']})")
+    print(f"new  {label(b)}  ({b['created']}, jobs={b['jobs']})")
+    if a["counts"] != b["counts"]:
+        print(f"warning: corpora differ: {a['counts']} vs {b['counts']}")
+
+    print(f"{'files':>7}  {'stage':<30}{'base':>10}{'new':>10}{'change':>9}")
+    for size in sorted(set(a["sizes"]) & set(b["sizes"]), key=int):
+        ta, tb = a["sizes"][size]["seconds"], b["sizes"][size]["seconds"]
+        for stage in ta:
+            if stage not in tb:
+                continue
+            change = (tb[stage] - ta[stage]) / ta[stage] * 100 if ta[stage] else 0.0
+            print(f"{size:>7}  {stage:<30}{ta[stage]:>9.2f}s{tb[stage]:>9.2f}s{change:>+8.1f}%")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the docs pipeline offline.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    refs = sub.add_parser("refs", help="idea reference extraction vs. ideas per file")
+    refs.add_argument("--ideas", type=int, default=200)
+
+    parse = sub.add_parser("parse", help="C type/function extraction over a tree")
+    parse.add_argument("dirs", nargs="*", type=Path)
+    parse.add_argument("--files", type=int, default=200,
+                       help="synthetic files to generate when no DIR is given")
+
+    eng = sub.add_parser("engines", help="c_parse engine parity check and timing")
+    eng.add_argument("dirs", nargs="*", type=Path)
+    eng.add_argument("--files", type=int, default=200,
+                     help="synthetic files to generate when no DIR is given")
+
+    incr = sub.add_parser("incremental", help="incremental reparse parity check and latency")
+    incr.add_argument("dirs", nargs="*", type=Path)
+    incr.add_argument("--files", type=int, default=50,
+                      help="synthetic files to generate when no DIR is given")
+    incr.add_argument("--edits", type=int, default=20, help="random edits per file")
+
+    idearefs = sub.add_parser("idearefs", help="idea-reference linking: per-ref scan vs. automaton")
+    idearefs.add_argument("--titles", type=int, default=2000)
+    idearefs.add_argument("--ideas", type=int, default=500)
+    idearefs.add_argument("--refs", type=int, default=8, help="references per idea")
+
+    suite = sub.add_parser("suite", help="timed make_json/make_md/pipeline runs over "
+                                         "synthetic corpora, saved as JSON")
+    suite.add_argument("--sizes", type=int, nargs="+", default=list(SUITE_SIZES),
+                       help="corpus sizes in files (default: %(default)s)")
+    for name, default in SUITE_COUNTS.items():
+        suite.add_argument(f"--{name.replace('_', '-')}", type=int, default=default,
+                           help=f"{name.replace('_', ' ')} per file (default: {default})")
+    suite.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 4,
+                       help="make_md / generate.py worker processes")
+    suite.add_argument("--no-pipeline", action="store_true",
+                       help="skip the end-to-end generate.py run")
+    suite.add_argument("--out", type=Path,
+                       help=f"result file (default: {SUITE_OUT.name}/<commit>.json)")
+
+    compare = sub.add_parser("compare", help="compare two `suite` result files")
+    compare.add_argument("base", type=Path)
+    compare.add_argument("new", type=Path)
+
+    args = ap.parse_args()
+    if args.cmd == "refs":
+        bench_refs(args.ideas)
+    elif args.cmd == "parse":
+        bench_parse(args.dirs, args.files)
+    elif args.cmd == "engines":
+        sys.exit(1 if bench_engines(args.dirs, args.files) else 0)
+    elif args.cmd == "incremental":
+        sys.exit(1 if bench_incremental(args.dirs, args.files, args.edits) else 0)
+    elif args.cmd == "idearefs":
+        bench_idearefs(args.titles, args.ideas, args.refs)
+    elif args.cmd == "suite":
+        counts = {name: getattr(args, name) for name in SUITE_COUNTS}
+        out = args.out
+        if out is None:
+            commit, dirty = _git_commit()
+            out = SUITE_OUT / f"{(commit or 'unknown')[:10]}{'-dirty' if dirty else ''}.json"
+        sys.exit(bench_suite(args.sizes, counts, max(1, args.jobs), out,
+                             pipeline=not args.no_pipeline))
+    elif args.cmd == "compare":
+        bench_compare(args.base, args.new)
+
+
+if __name__ == "__main__":
+    main()
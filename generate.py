@@ -2,35 +2,91 @@
 """
 charmos docs build pipeline
 ────────────────────────────
-Clones the source repo, parses every header/source file into JSON in
-parallel, then compiles the JSON into MDX documentation.
+Fetches the charmos sources (or links an existing checkout, see
+--local), parses every header/source file in parallel,
+then compiles the parsed records into MDX documentation.  The records
+stay in memory between the two stages; pass --emit-json to also keep
+them on disk.
+
+`generate.py watch` builds once, then keeps running: every saved source,
+dir_doc_name or index.mdx file is reparsed and only the pages it affects
+are re-rendered and copied into the site for `astro dev` to hot-reload.
 """
 
+import argparse
+import cProfile
+import csv
+import hashlib
+import json
+import pickle
+import select
+import sqlite3
+import struct
 import subprocess
 import shutil
 import threading
 import time
 import sys
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+import make_json
+import make_md
+import records
+import symbols
+
 # ── Config ────────────────────────────────────────────────────────────────────
 
 REPO_URL   = "https://github.com/bluegummi/charmos.git"
+REPO_REF   = "main"
 CLONE_DIR  = Path("./charmos")
 JSON_OUT   = Path("./json_output")
 MD_OUT     = Path("./docs")
-LIMINE_URL = "https://github.com/limine-bootloader/limine"
-LIMINE_DIR = Path("./limine")
+CACHE_DIR  = Path("./.build_cache")
+
+# --profile writes profile.json / profile.csv (and, with --pstats, one
+# cProfile dump per step) here and prints the PROFILE_TOP slowest files
+# and pages.
+PROFILE_DIR = Path("./build_profile")
+PROFILE_TOP = 20
+
+# Symbol index written after parsing (see symbols.py); make_md loads its
+# type/doc/function/global tables from it.
+SYMBOL_INDEX = Path("./symbols.sqlite")
 
 SOURCE_DIRS = [
     "include",
-    # "kernel",
+    "kernel",
 ]
 
 MAX_WORKERS = min(16, (os.cpu_count() or 4) * 2)
 
+# Files per `make_json.py --batch` process in --subprocess mode.
+SUBPROCESS_BATCH = 32
+
+# Worker processes for the in-process parser pool.  Each one is CPU-bound,
+# so there is no point oversubscribing the way the subprocess threads do.
+POOL_WORKERS = min(MAX_WORKERS, os.cpu_count() or 4)
+
+# Where the site's Starlight content lives; watch mode mirrors docs/ here
+# the way the CI workflow does before `astro build`.
+SITE_REFERENCE   = Path("site/src/content/docs/reference")
+SITE_INDEX_SRC   = Path("site/docs_reference_index.mdx")
+
+# Watch mode: a burst of events is handled once no new event has arrived
+# for WATCH_DEBOUNCE_S; the polling fallback rescans every WATCH_POLL_S.
+WATCH_DEBOUNCE_S = 0.1
+WATCH_POLL_S     = 0.25
+
+# Target for parsing all of SOURCE_DIRS from scratch with 8 workers.  The
+# parse step warns when it runs over, scaled to the workers actually used
+# and the share of files that were not cached.
+PARSE_BUDGET_S       = 30.0
+PARSE_BUDGET_WORKERS = 8
+
 # ── ANSI palette ──────────────────────────────────────────────────────────────
 
 ESC = "\033["
@@ -99,7 +155,7 @@ class ProgressBar:
     SPIN  = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏"
 
     def __init__(self, total: int, label: str):
-        self.total    = max(total, 1)
+        self.total    = total
         self.label    = label
         self._done    = 0
         self._lock    = threading.Lock()
@@ -110,15 +166,23 @@ class ProgressBar:
         self._thread = threading.Thread(target=self._tick, daemon=True)
         self._thread.start()
 
+    def expect(self, n: int = 1):
+        """Raise the total by n, for work that is discovered as it goes."""
+        with self._lock:
+            self.total += n
+
     def advance(self, n: int = 1):
         with self._lock:
             self._done = min(self._done + n, self.total)
 
     def finish(self):
+        """Stop the bar and draw it complete; a bar that never had any work draws nothing."""
         with self._lock:
             self._done    = self.total
             self._active  = False
         self._thread.join()
+        if not self.total:
+            return
         self._render(final=True)
         sys.stdout.write("\n")
         sys.stdout.flush()
@@ -133,6 +197,8 @@ class ProgressBar:
         with self._lock:
             done  = self._done
             total = self.total
+        if not total:
+            return
 
         pct   = done / total
         filled = int(BAR_WIDTH * pct)
@@ -174,10 +240,14 @@ def begin_step(name: str, detail: str = "") -> float:
     name_str = c(name, WHITE, BOLD)
     det_str  = (c(f"  {detail}", GRAY)) if detail else ""
     safe_print(f"\n{num_str} {name_str}{det_str}")
+    if _PROFILE is not None:
+        _PROFILE.begin_stage(f"{n:02d} {name}")
     return time.monotonic()
 
 def end_step(t0: float, note: str = ""):
     elapsed = time.monotonic() - t0
+    if _PROFILE is not None:
+        _PROFILE.end_stage(elapsed)
     tick    = c("✓", GREEN, BOLD)
     time_s  = c(f"{elapsed:.1f}s", GRAY)
     note_s  = c(f"  {note}", DIM) if note else ""
@@ -189,6 +259,114 @@ def fail_step(msg: str):
     sys.exit(1)
 
 
+# ── Build profile ─────────────────────────────────────────────────────────────
+
+class BuildProfile:
+    """
+    Timings collected by `--profile`.  Every begin_step()/end_step() pair
+    is a stage; within them the parse and compile steps add the parse time
+    of each source file, the render time of each page, the time spent in
+    each of make_md's timed rewrite passes and the time spent reading and
+    writing records, caches and manifests.
+
+    Pass times are inclusive (the linkers run inside merge_changelog_and_notes,
+    for instance) and summed over all worker processes, so they do not add
+    up to the compile stage's wall time.  With pstats, each stage also runs
+    under cProfile in this process; work done in pool workers shows up
+    there only as time spent waiting for them.
+    """
+
+    def __init__(self, pstats: bool = False):
+        self.stages: dict[str, float] = {}
+        self.files:  dict[str, float] = {}
+        self.pages:  dict[str, float] = {}
+        self.passes: dict[str, dict]  = {}
+        self.io:     dict[str, dict]  = {}
+        self.pstats  = pstats
+        self._stage  = None
+        self._prof   = None
+
+    def begin_stage(self, name: str):
+        self._stage = name
+        if self.pstats:
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+
+    def end_stage(self, elapsed: float):
+        if self._prof is not None:
+            self._prof.disable()
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            slug = "".join(ch if ch.isalnum() else "_" for ch in self._stage.lower())
+            self._prof.dump_stats(PROFILE_DIR / f"{slug}.pstats")
+            self._prof = None
+        self.stages[self._stage] = elapsed
+        self._stage = None
+
+    def add_io(self, name: str, seconds: float, calls: int = 1):
+        entry = self.io.setdefault(name, {"calls": 0, "seconds": 0.0})
+        entry["calls"]   += calls
+        entry["seconds"] += seconds
+
+    def add_render(self, profile: dict):
+        """Fold in make_md.generate_docs(profile=True)'s stats["profile"]."""
+        self.pages.update(profile["pages"])
+        for name, t in profile["passes"].items():
+            entry = self.passes.setdefault(name, {"calls": 0, "seconds": 0.0})
+            entry["calls"]   += t["calls"]
+            entry["seconds"] += t["seconds"]
+        for name, seconds in profile["io"].items():
+            self.add_io(name, seconds)
+
+    def write(self) -> tuple[Path, Path]:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        json_path = PROFILE_DIR / "profile.json"
+        csv_path  = PROFILE_DIR / "profile.csv"
+        json_path.write_text(json.dumps({
+            "stages": self.stages,
+            "files":  self.files,
+            "pages":  self.pages,
+            "passes": self.passes,
+            "io":     self.io,
+        }, indent=1), encoding="utf-8")
+
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            out = csv.writer(f)
+            out.writerow(["kind", "name", "calls", "seconds"])
+            for kind, times in (("stage", self.stages), ("file", self.files),
+                                ("page", self.pages)):
+                for name, seconds in times.items():
+                    out.writerow([kind, name, 1, f"{seconds:.6f}"])
+            for kind, times in (("pass", self.passes), ("io", self.io)):
+                for name, t in times.items():
+                    out.writerow([kind, name, t["calls"], f"{t['seconds']:.6f}"])
+        return json_path, csv_path
+
+    def print_report(self):
+        def slowest(title: str, times: dict):
+            if not times:
+                return
+            top = sorted(times.items(), key=lambda kv: kv[1], reverse=True)[:PROFILE_TOP]
+            safe_print(c(f"\n  {title} — slowest {len(top)} of {len(times)}", WHITE, BOLD))
+            for name, seconds in top:
+                safe_print(f"  {seconds * 1000:>9.1f}ms  {c(name, GRAY)}")
+
+        def totals(title: str, times: dict):
+            if not times:
+                return
+            safe_print(c(f"\n  {title}", WHITE, BOLD))
+            for name, t in sorted(times.items(), key=lambda kv: kv[1]["seconds"], reverse=True):
+                safe_print(f"  {t['seconds'] * 1000:>9.1f}ms  {t['calls']:>7} calls  "
+                           f"{c(name, GRAY)}")
+
+        slowest("parse time per file", self.files)
+        slowest("render time per page", self.pages)
+        totals("rewrite passes (inclusive, all workers)", self.passes)
+        totals("record / cache I/O", self.io)
+
+
+_PROFILE: BuildProfile = None
+
+
 # ── Banner ────────────────────────────────────────────────────────────────────
 
 def print_banner():
@@ -202,134 +380,633 @@ def print_banner():
         print(l)
 
 
-# ── Pipeline steps ────────────────────────────────────────────────────────────
+# ── Parse cache ───────────────────────────────────────────────────────────────
 
-def clone_repo():
-    t0 = begin_step("Clone repository", REPO_URL)
+def _sha256_file(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
 
-    if CLONE_DIR.exists():
-        safe_print(c("  ↩  already cloned — skipping", GRAY))
-        end_step(t0, "cached")
-        return
 
-    _run(["git", "clone", "--depth=1", REPO_URL, str(CLONE_DIR)])
-    _run(["git", "submodule", "init"],   cwd=CLONE_DIR)
-    _run(["git", "submodule", "update"], cwd=CLONE_DIR)
+class ParseCache:
+    """
+    Persistent make_json output cache, keyed by the SHA-256 of each source
+    file.  The manifest also records a hash of make_json.py itself; when the
+    parser changes every entry is treated as stale.
+
+    It also records the charmos commit the entries were parsed at, and
+    which entries (uncommitted edits, watch-mode saves, failed parses) may
+    not match that commit.  --since relies on every other entry matching
+    it: files git reports unchanged since then are not even hashed.
+
+    Layout:
+        .build_cache/manifest.json   {"layout": 2, "parser": sha, "commit": sha,
+                                      "dirty": [src], "files": {src: {...}}}
+        .build_cache/json/<sha256(src)[:16]>.rec    (records.py "packed" format)
+
+    Records are named by a hash of the full source path, so two sources
+    that share their last directories and stem never share a record.
+    """
 
-    tests_dir = CLONE_DIR / "kernel/uACPI/tests"
-    if tests_dir.exists():
-        shutil.rmtree(tests_dir)
+    LAYOUT = 2
+
+    def __init__(self, root: Path = CACHE_DIR):
+        self.root     = root
+        self.json_dir = root / "json"
+        self.manifest = root / "manifest.json"
+        self.parser   = _sha256_file(Path(__file__).with_name("make_json.py"))
+        self.files: dict[str, dict] = {}
+        self.commit = None
+        self.dirty: set[str] = set()
+
+        t0 = time.perf_counter()
+        if self.manifest.is_file():
+            try:
+                data = json.loads(self.manifest.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            if data.get("parser") == self.parser and data.get("layout") == self.LAYOUT:
+                self.files  = data.get("files", {})
+                self.commit = data.get("commit")
+                self.dirty  = set(data.get("dirty", []))
+        if _PROFILE is not None:
+            _PROFILE.add_io("parse cache manifest load", time.perf_counter() - t0)
+
+    def lookup(self, src: Path, digest: str):
+        """
+        Return (hit, record).  A hit with a None record means the file was
+        parsed before and produced no output (ignored directory).  With a
+        None digest the entry is trusted without comparing hashes.
+        """
+        entry = self.files.get(str(src))
+        if not entry or (digest is not None and entry.get("hash") != digest):
+            return False, None
+        name = entry.get("json")
+        if name is None:
+            return True, None
+        t0 = time.perf_counter()
+        try:
+            return True, records.read_record(self.json_dir / name)
+        except (OSError, ValueError, pickle.UnpicklingError):
+            return False, None
+        finally:
+            if _PROFILE is not None:
+                _PROFILE.add_io("parse cache record read", time.perf_counter() - t0)
+
+    def store(self, src: Path, digest: str, record):
+        name = None
+        if record is not None:
+            self.json_dir.mkdir(parents=True, exist_ok=True)
+            name = hashlib.sha256(str(src).encode("utf-8")).hexdigest()[:16] + records.FORMATS["packed"]
+            t0 = time.perf_counter()
+            records.write_record(record, self.json_dir / name, "packed")
+            if _PROFILE is not None:
+                _PROFILE.add_io("parse cache record write", time.perf_counter() - t0)
+        self.files[str(src)] = {"hash": digest, "json": name}
+        self.dirty.add(str(src))
+
+    def record_commit(self, commit, dirty):
+        """
+        Mark every entry as parsed at commit except the paths in dirty.
+        A None commit or dirty (git could not tell) drops the commit.
+        """
+        if commit is None or dirty is None:
+            self.commit, self.dirty = None, set()
+        else:
+            self.commit, self.dirty = commit, {str(p) for p in dirty}
+
+    def save(self):
+        t0 = time.perf_counter()
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"layout": self.LAYOUT, "parser": self.parser, "commit": self.commit,
+                        "dirty": sorted(self.dirty), "files": self.files}, indent=1),
+            encoding="utf-8",
+        )
+        tmp.replace(self.manifest)
+        if _PROFILE is not None:
+            _PROFILE.add_io("parse cache manifest save", time.perf_counter() - t0)
 
-    if not LIMINE_DIR.exists():
-        _run([
-            "git", "clone",
-            "--branch=v9.x-binary", "--depth=1",
-            LIMINE_URL, str(LIMINE_DIR),
-        ])
 
-    end_step(t0)
+# ── Source providers ──────────────────────────────────────────────────────────
+
+def _git_head(path: Path):
+    """HEAD of the checkout or worktree rooted at path, or None if it is not one."""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--show-toplevel", "HEAD"],
+                                cwd=path, capture_output=True, text=True)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    top, head = result.stdout.split()
+    return head if Path(top).resolve() == Path(path).resolve() else None
+
+
+class SourceProvider(ABC):
+    """
+    Where the charmos tree under CLONE_DIR comes from.  prepare() makes
+    CLONE_DIR hold the sources to document and returns a note for the
+    step line; commit() is the commit they were checked out at, or None
+    when the tree is not a git checkout.  release() undoes anything
+    prepare() set up that must not outlive the build.
+    """
+    detail = ""
+
+    @abstractmethod
+    def prepare(self) -> str:
+        ...
+
+    def commit(self):
+        return _git_head(CLONE_DIR)
+
+    def release(self):
+        pass
+
+
+class LocalCheckout(SourceProvider):
+    """
+    An existing checkout or worktree, used in place: CLONE_DIR becomes a
+    symlink to it for the length of the build, so record paths (and every
+    page) are the same as for a fetched tree.  With no path, CLONE_DIR
+    itself is used as it is.  Nothing touches the network.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path   = Path(path).resolve() if path else None
+        self.detail = f"local  •  {path or CLONE_DIR}"
+        self.linked = False
+
+    def prepare(self) -> str:
+        if self.path is None:
+            if not CLONE_DIR.is_dir():
+                fail_step(f"{CLONE_DIR} does not exist; offline builds need an existing checkout")
+            return "offline"
+
+        if not (self.path / "include").is_dir():
+            fail_step(f"{self.path} does not look like a charmos checkout (no include/)")
+        if CLONE_DIR.is_symlink():
+            if CLONE_DIR.resolve() == self.path:
+                return "linked"
+            CLONE_DIR.unlink()
+        elif CLONE_DIR.exists():
+            fail_step(f"{CLONE_DIR} already exists; remove it to build from {self.path}")
+        CLONE_DIR.symlink_to(self.path, target_is_directory=True)
+        self.linked = True
+        return "linked"
+
+    def release(self):
+        if self.linked and CLONE_DIR.is_symlink():
+            CLONE_DIR.unlink()
+        self.linked = False
+
+
+class GitFetch(SourceProvider):
+    """
+    `ref` (a branch, tag or commit) of `url`, fetched with --depth=1 into
+    CLONE_DIR: `git init` the first time, then only that ref is fetched and
+    checked out on every later build, so a stale tree is brought up to
+    date without a full clone.  Local changes under CLONE_DIR are
+    discarded.  Submodules matching the ignore globs (by default
+    make_json.IGNORE_DIRS: uACPI, flanterm) are never fetched: none of
+    their files are documented.
+
+    GitFetch only ever fetches into a clone it created itself, which it
+    marks with FETCH_MARKER inside .git.  A CLONE_DIR symlink (left by an
+    interrupted --local build) is removed, never followed, and a fresh
+    clone is made in its place.  Any other existing CLONE_DIR — a copied
+    or hand-made tree, or someone else's checkout — is used as it is.
+    """
+
+    FETCH_MARKER = "charmos-docs-fetch"
+
+    def __init__(self, url: str = REPO_URL, ref: str = REPO_REF, ignore=None):
+        self.url    = url
+        self.ref    = ref
+        self.ignore = ignore
+        self.detail = f"{url}  •  {ref}"
+
+    def prepare(self) -> str:
+        marker = CLONE_DIR / ".git" / self.FETCH_MARKER
+        if CLONE_DIR.is_symlink():
+            safe_print(c(f"  ↩  {CLONE_DIR} links to {os.readlink(CLONE_DIR)} — "
+                         "replacing the link with a fresh clone", GRAY))
+            CLONE_DIR.unlink()
+        elif CLONE_DIR.exists() and not marker.is_file():
+            what = "not a git checkout" if _git_head(CLONE_DIR) is None else "not cloned by this script"
+            safe_print(c(f"  ↩  {CLONE_DIR} is {what} — using it as is", GRAY))
+            return what
+
+        if not CLONE_DIR.exists():
+            CLONE_DIR.mkdir(parents=True)
+            _run(["git", "init", "-q"], cwd=CLONE_DIR)
+            _run(["git", "remote", "add", "origin", self.url], cwd=CLONE_DIR)
+            marker.write_text(f"{self.url}\n", encoding="utf-8")
+        else:
+            _run(["git", "remote", "set-url", "origin", self.url], cwd=CLONE_DIR)
+
+        before = _git_head(CLONE_DIR)
+        _run(["git", "fetch", "-q", "--depth=1", "origin", self.ref], cwd=CLONE_DIR)
+        _run(["git", "checkout", "-q", "--force", "--detach", "FETCH_HEAD"], cwd=CLONE_DIR)
+
+        submodules = self._documented_submodules()
+        if submodules:
+            _run(["git", "submodule", "update", "-q", "--init", "--depth=1", "--", *submodules],
+                 cwd=CLONE_DIR)
+
+        after = _git_head(CLONE_DIR)
+        if before == after:
+            return "up to date"
+        return f"updated from {before[:10]}" if before else "fetched"
+
+    def _documented_submodules(self) -> list[str]:
+        result = subprocess.run(
+            ["git", "config", "-f", ".gitmodules", "--get-regexp", r"^submodule\..*\.path$"],
+            cwd=CLONE_DIR, capture_output=True, text=True,
+        )
+        paths = [line.split(" ", 1)[1] for line in result.stdout.splitlines() if " " in line]
+        return [p for p in paths if not make_json.should_ignore_file(Path(p), self.ignore)]
+
+
+def source_provider(args, ignore=None) -> SourceProvider:
+    if args.local:
+        return LocalCheckout(args.local)
+    if args.offline:
+        return LocalCheckout()
+    return GitFetch(REPO_URL, args.ref, ignore)
 
 
-def prepare_output_dirs():
+def _git(*args, cwd: Path = CLONE_DIR):
+    """stdout of a git command in cwd, or None if it failed."""
+    try:
+        result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _worktree_changes(base: str):
+    """
+    Paths under CLONE_DIR whose content may differ from commit base:
+    tracked files changed since base (committed or not) and untracked
+    files.  A changed submodule is reported as its directory.  None if
+    git cannot tell.
+    """
+    diff      = _git("diff", "--name-only", "--no-renames", base, "--")
+    untracked = _git("ls-files", "--others", "--exclude-standard")
+    if diff is None or untracked is None:
+        return None
+    return {CLONE_DIR / p for p in (diff + untracked).splitlines() if p}
+
+
+def _touched(path: Path, changed: set) -> bool:
+    return path in changed or any(parent in changed for parent in path.parents)
+
+
+# ── Pipeline steps ────────────────────────────────────────────────────────────
+
+def clone_repo(provider: SourceProvider = None):
+    """Bring CLONE_DIR up to date from provider; returns its commit (or None)."""
+    provider = provider or GitFetch()
+    t0 = begin_step("Prepare sources", provider.detail)
+    note   = provider.prepare()
+    commit = provider.commit()
+    end_step(t0, f"{note}  •  {commit[:10]}" if commit else note)
+    return commit
+
+
+def diff_sources(cache: ParseCache, since: str = None):
+    """
+    For --since: every source path that may differ from what the parse
+    cache holds — `git diff` from the commit the previous build recorded
+    to the worktree, plus the entries it already knew were off that
+    commit.  Returns None, and every file is hashed as usual, when that
+    cannot be worked out.
+
+    cache is the ParseCache the build will reuse.  since is the commit the
+    caller believes the previous build was made from; when the cache says
+    otherwise, the cache wins.
+    """
+    base  = cache.commit
+    t0    = begin_step("Diff sources", f"since {since or base or 'last build'}")
+
+    def fallback(msg):
+        safe_print(c(f"  ⚠  {msg} — full rebuild, hashing every file", YELLOW))
+        end_step(t0)
+        return None
+
+    if base is None:
+        return fallback("the previous build recorded no charmos commit")
+    if since:
+        resolved = (_git("rev-parse", "--verify", "-q", f"{since}^{{commit}}") or "").strip()
+        if resolved != base:
+            safe_print(c(f"  ⚠  the previous build was made from {base[:10]}, not {since}; "
+                         f"diffing from {base[:10]}", YELLOW))
+
+    # A shallow clone only has the commit it checked out
+    if _git("cat-file", "-e", f"{base}^{{commit}}") is None:
+        _git("fetch", "-q", "--depth=1", "origin", base)
+        if _git("cat-file", "-e", f"{base}^{{commit}}") is None:
+            return fallback(f"{base[:10]} is not in the clone and could not be fetched")
+    changed = _worktree_changes(base)
+    if changed is None:
+        return fallback(f"cannot diff against {base[:10]}")
+
+    changed |= {Path(p) for p in cache.dirty}
+    end_step(t0, f"{len(changed)} path(s) changed since {base[:10]}")
+    return changed
+
+
+def prepare_output_dirs(emit_json: bool = False):
     t0 = begin_step("Prepare output directories")
     if JSON_OUT.exists():
         shutil.rmtree(JSON_OUT)
-    JSON_OUT.mkdir(parents=True)
+    if emit_json:
+        JSON_OUT.mkdir(parents=True)
     MD_OUT.mkdir(parents=True, exist_ok=True)
     end_step(t0)
 
 
-def _json_path_for(file_path: Path) -> Path:
-    parents  = file_path.parts[-3:-1]
-    name_bits = list(parents) + [file_path.stem]
-    return JSON_OUT / ("_".join(name_bits) + ".json")
+def _json_path_for(file_path: Path, fmt: str = "json") -> Path:
+    return JSON_OUT / records.record_name(file_path, fmt)
 
 
-def run_make_json():
-    files = []
-    for dir_name in SOURCE_DIRS:
-        dp = CLONE_DIR / dir_name
-        if dp.exists():
-            files.extend(dp.rglob("*.c"))
-            files.extend(dp.rglob("*.h"))
-    files = [f for f in files if f.is_file()]
+_WARMUP_SOURCE = b"struct warmup { int a; union { long b; } u; };\nint warmup(void);\n"
 
-    if not files:
-        safe_print(c("  ⚠  no source files found", YELLOW))
-        return
 
-    t0  = begin_step("Parse source files → JSON", f"{len(files)} files  •  {MAX_WORKERS} workers")
-    bar = ProgressBar(len(files), "parsing")
-    errors: list[str] = []
-    err_lock = threading.Lock()
+def _init_parse_worker():
+    # Run one tiny parse per worker process so the grammar tables and the
+    # c_parse walk are paged in before the first real file is timed.
+    tree = make_json.parser.parse(_WARMUP_SOURCE)
+    make_json.collect_c_parse(tree.root_node, _WARMUP_SOURCE)
 
-    def parse_one(f: Path):
-        out = _json_path_for(f)
-        try:
-            result = subprocess.run(
-                ["python3", "make_json.py", str(f), str(out)],
-                capture_output=True, text=True,
-            )
-            if result.returncode != 0:
-                with err_lock:
-                    errors.append(f"{f.name}: {result.stderr.strip()[:120]}")
-        except Exception as e:
-            with err_lock:
-                errors.append(f"{f.name}: {e}")
-        finally:
-            bar.advance()
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
-        futures = [pool.submit(parse_one, f) for f in files]
-        for _ in as_completed(futures):
-            pass  # progress driven by bar.advance() inside parse_one
+def _parse_in_worker(src: str, out: str = None, fmt: str = "json"):
+    """Returns (record, parse seconds, record-write seconds)."""
+    t0     = time.perf_counter()
+    record = make_json.process_file(Path(src), None, fmt)
+    t1     = time.perf_counter()
+    if record is not None and out:
+        records.write_record(record, Path(out), fmt)
+    return record, t1 - t0, time.perf_counter() - t1
+
 
+def discover_sources(ignore=None):
+    """
+    Yield (root index, path) for every .c/.h file under SOURCE_DIRS as
+    make_json.iter_source_files() finds it, skipping (and never descending
+    into) paths matching the ignore globs.
+    """
+    for i, dir_name in enumerate(SOURCE_DIRS):
+        for f in make_json.iter_source_files([CLONE_DIR / dir_name], ignore):
+            yield i, f
+
+
+def run_make_json(use_subprocess: bool = False, use_cache: bool = True,
+                  emit_json: bool = False, fmt: str = "json",
+                  commit: str = None, changed: set = None,
+                  ignore=None, cache: ParseCache = None) -> list[dict]:
+    """
+    Parse every source file and return the make_json records in memory.
+    Record files (in records.FORMATS format fmt) are only written to
+    JSON_OUT with emit_json — always the case in subprocess mode, which
+    can only hand results back that way.
+
+    Discovery streams straight into the workers: each file is checked
+    against the cache and, if stale, handed to the parser as soon as the
+    walk finds it.  ignore (default make_json.IGNORE_DIRS) is pruned
+    during the walk.
+
+    commit is the charmos commit being built, recorded in the parse cache.
+    With changed (from diff_sources()), cached files outside it are reused
+    without hashing them.  cache is a ParseCache the caller already
+    loaded; with use_cache and none given, it is loaded here.
+    """
+    emit_json = emit_json or use_subprocess
+
+    workers = MAX_WORKERS if use_subprocess else POOL_WORKERS
+    mode    = "subprocess" if use_subprocess else "in-process"
+    t0  = begin_step("Parse source files", f"{workers} workers  •  {mode}")
+    bar = ProgressBar(0, "parsing")
+    errors: list[tuple[Path, str]] = []
+
+    # Reuse the cached record for every file whose content hash is
+    # unchanged and only hand the rest to the parser.
+    if cache is None and use_cache:
+        cache = ParseCache()
+    digests = {}
+    parsed: dict[Path, dict] = {}
+    found:  list[tuple] = []
+    stale:  list[Path]  = []
+
+    def stale_sources():
+        for root_index, f in discover_sources(ignore):
+            found.append((root_index, f.suffix != ".c", len(found), f))
+            if cache is not None:
+                if changed is not None and not _touched(f, changed):
+                    hit, record = cache.lookup(f, None)
+                else:
+                    digest      = digests[f] = _sha256_file(f)
+                    hit, record = cache.lookup(f, digest)
+                if hit:
+                    if record is not None:
+                        parsed[f] = record
+                        if emit_json:
+                            t_write = time.perf_counter()
+                            records.write_record(record, _json_path_for(f, fmt), fmt)
+                            if _PROFILE is not None:
+                                _PROFILE.add_io("record write", time.perf_counter() - t_write)
+                    continue
+            stale.append(f)
+            bar.expect()
+            yield f
+
+    if use_subprocess:
+        _parse_with_subprocesses(stale_sources(), bar, errors, fmt)
+        for f in stale:
+            out = _json_path_for(f, fmt)
+            if out.is_file():
+                t_read = time.perf_counter()
+                parsed[f] = records.read_record(out)
+                if _PROFILE is not None:
+                    _PROFILE.add_io("record read", time.perf_counter() - t_read)
+    else:
+        _parse_with_pool(stale_sources(), bar, errors, parsed, emit_json, fmt)
     bar.finish()
 
+    # Records keep the order of the old per-directory `*.c` then `*.h`
+    # rglob passes, which decides precedence between duplicate symbols.
+    files = [f for *_, f in sorted(found)]
+    if not files:
+        safe_print(c("  ⚠  no source files found", YELLOW))
+        end_step(t0)
+        return []
+
+    if cache is not None:
+        failed = {f for f, _ in errors}
+        for f in stale:
+            if f not in failed:
+                cache.store(f, digests.get(f) or _sha256_file(f), parsed.get(f))
+        dirty = _worktree_changes(commit) if commit else None
+        cache.record_commit(commit, None if dirty is None else dirty | failed)
+        cache.save()
+
     if errors:
         safe_print(c(f"  ⚠  {len(errors)} file(s) had errors:", YELLOW))
-        for e in errors[:8]:
-            safe_print(c(f"     • {e}", GRAY))
+        for f, msg in errors[:8]:
+            safe_print(c(f"     • {f.name}: {msg}", GRAY))
         if len(errors) > 8:
             safe_print(c(f"     … and {len(errors)-8} more", GRAY))
 
-    end_step(t0, f"{len(files) - len(errors)}/{len(files)} succeeded")
+    note = f"{len(files)} files  •  {len(files) - len(errors)}/{len(files)} succeeded"
+    if cache is not None:
+        note += f"  •  {len(stale)} parsed, {len(files) - len(stale)} reused"
 
+    elapsed = time.monotonic() - t0
+    budget  = PARSE_BUDGET_S * PARSE_BUDGET_WORKERS / workers * len(stale) / len(files)
+    if stale and elapsed > budget:
+        safe_print(c(f"  ⚠  parsing took {elapsed:.1f}s, over the {budget:.1f}s budget "
+                     f"({PARSE_BUDGET_S:.0f}s for the full tree on "
+                     f"{PARSE_BUDGET_WORKERS} workers)", YELLOW))
+    end_step(t0, note)
+
+    return [parsed[f] for f in files if f in parsed]
+
+
+def _parse_with_pool(files: Iterable[Path], bar: ProgressBar,
+                     errors: list[tuple[Path, str]],
+                     parsed: dict[Path, dict], emit_json: bool, fmt: str):
+    with ProcessPoolExecutor(max_workers=POOL_WORKERS,
+                             initializer=_init_parse_worker) as pool:
+        futures = {
+            pool.submit(_parse_in_worker, str(f),
+                        str(_json_path_for(f, fmt)) if emit_json else None, fmt): f
+            for f in files
+        }
+        for fut in as_completed(futures):
+            f = futures[fut]
+            try:
+                record, parse_s, write_s = fut.result()
+                if record is not None:
+                    parsed[f] = record
+                if _PROFILE is not None:
+                    _PROFILE.files[str(f)] = parse_s
+                    if emit_json and record is not None:
+                        _PROFILE.add_io("record write", write_s)
+            except Exception as e:
+                errors.append((f, str(e).strip()[:120]))
+            finally:
+                bar.advance()
+
+
+def _parse_with_subprocesses(files: Iterable[Path], bar: ProgressBar,
+                             errors: list[tuple[Path, str]], fmt: str):
+    """
+    `python3 make_json.py --batch` over SUBPROCESS_BATCH files at a time.
+    Slower than the in-process pool, but a crash only takes down its own
+    batch, whose files are then re-run one process each so the one that
+    crashes is reported by itself.
+    """
+    err_lock = threading.Lock()
 
-def run_make_md():
-    t0 = begin_step("Compile JSON → MDX")
-
-    # Show a spinner while the single-threaded md generator runs
-    done_event = threading.Event()
+    def run(cmd: list, batch: list[Path]):
+        t0 = time.perf_counter()
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        except Exception as e:
+            return None, str(e)
+        finally:
+            if _PROFILE is not None:
+                # Whole-process wall time (interpreter start-up and record
+                # writes included), split evenly across the batch
+                share = (time.perf_counter() - t0) / len(batch)
+                for f in batch:
+                    _PROFILE.files[str(f)] = share
+        return result, None
 
-    def spinner_thread():
-        spin = ProgressBar.SPIN
-        i = 0
-        while not done_event.is_set():
-            s = c(spin[i % len(spin)], CYAN, BOLD)
-            msg = c("  compiling…", GRAY)
-            with _print_lock:
-                sys.stdout.write(f"\r  {s}{msg}")
-                sys.stdout.flush()
-            i += 1
-            time.sleep(0.08)
+    def parse_one(f: Path):
+        result, exc = run(["python3", "make_json.py", str(f), str(_json_path_for(f, fmt)),
+                           "--format", fmt], [f])
+        if exc is not None or result.returncode != 0:
+            with err_lock:
+                errors.append((f, exc or result.stderr.strip()[:120]))
 
-    t = threading.Thread(target=spinner_thread, daemon=True)
-    t.start()
+    def parse_batch(batch: list[Path]):
+        try:
+            result, exc = run(["python3", "make_json.py", "--batch", "--out-dir", str(JSON_OUT),
+                               "--format", fmt, *map(str, batch)], batch)
+            # Exit status 1 means per-file errors, reported as "<src>: <msg>"
+            if exc is None and result.returncode in (0, 1):
+                by_name = {str(f): f for f in batch}
+                for line in result.stderr.splitlines():
+                    name, _, msg = line.partition(": ")
+                    if name in by_name:
+                        with err_lock:
+                            errors.append((by_name[name], msg.strip()[:120]))
+                return
+            for f in batch:
+                parse_one(f)
+        finally:
+            bar.advance(len(batch))
 
-    result = subprocess.run(
-        ["python3", "make_md.py", str(JSON_OUT)],
-        capture_output=False, text=True,
-    )
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = []
+        batch   = []
+        for f in files:
+            batch.append(f)
+            if len(batch) == SUBPROCESS_BATCH:
+                futures.append(pool.submit(parse_batch, batch))
+                batch = []
+        if batch:
+            futures.append(pool.submit(parse_batch, batch))
+        for _ in as_completed(futures):
+            pass  # progress driven by bar.advance() inside parse_batch
 
-    done_event.set()
-    t.join()
-    _clear_line()
 
-    if result.returncode != 0:
-        fail_step(f"make_md.py failed:\n{result.stderr.strip()}")
+def update_symbol_index(parsed: list[dict]):
+    """
+    Re-index the records whose c_parse changed in SYMBOL_INDEX and load
+    make_md's symbol tables back from it.  Returns None if the index
+    cannot be used; make_md then builds the tables itself.
+    """
+    t0 = begin_step("Update symbol index", str(SYMBOL_INDEX))
+    try:
+        with symbols.SymbolIndex(SYMBOL_INDEX) as index:
+            changed = index.update(parsed)
+            tables  = index.tables([r["file"] for r in parsed])
+    except sqlite3.Error as e:
+        safe_print(c(f"  ⚠  symbol index unusable ({e}); building tables in make_md", YELLOW))
+        end_step(t0)
+        return None
+
+    end_step(t0, f"{changed} file(s) re-indexed  •  {len(tables['type_table'])} types, "
+                 f"{len(tables['functions_map'])} functions, {len(tables['globals_map'])} globals")
+    return tables
+
+
+def run_make_md(parsed: list[dict], use_cache: bool = True, jobs: int = POOL_WORKERS,
+                tables: dict = None):
+    corpus = make_md.Corpus(parsed)
+    t0  = begin_step("Compile MDX", f"{len(corpus)} pages  •  {jobs} workers")
+    bar = ProgressBar(len(corpus), "compiling")
+
+    deps_path = CACHE_DIR / "mdx_deps.json" if use_cache else None
+    try:
+        stats = make_md.generate_docs(corpus, deps_path=deps_path, jobs=jobs,
+                                      progress=bar.advance, tables=tables,
+                                      profile=_PROFILE is not None)
+    except Exception as e:
+        bar.finish()
+        fail_step(f"make_md failed: {type(e).__name__}: {e}")
 
-    end_step(t0)
+    bar.finish()
+    note = f"{stats['rebuilt']} rebuilt"
+    if use_cache:
+        note += f", {stats['unchanged']} unchanged, {stats['removed']} removed"
+    end_step(t0, note)
+    for line in make_md.format_type_cache_report(stats["type_caches"]):
+        safe_print(c(f"    {line}", GRAY))
+    if stats["profile"] is not None:
+        _PROFILE.add_render(stats["profile"])
 
 
 def delete_empty_markdown():
@@ -392,6 +1069,249 @@ def rename_directories_from_namefiles():
     end_step(t0, f"{renamed} director{'ies' if renamed != 1 else 'y'} renamed")
 
 
+# ── Watch mode ────────────────────────────────────────────────────────────────
+
+class _PollingWatcher:
+    """Fallback watcher: rescans the mtime of every file under the roots."""
+
+    def __init__(self, roots: list[Path]):
+        self.roots = roots
+        self.snapshot = self._scan()
+
+    def _scan(self) -> dict:
+        found = {}
+        for root in self.roots:
+            for p in root.rglob("*"):
+                try:
+                    if p.is_file():
+                        found[p] = p.stat().st_mtime_ns
+                except OSError:
+                    pass
+        return found
+
+    def wait(self, timeout: float = None) -> set[Path]:
+        """Paths changed, created or removed; empty once timeout (seconds) expires."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(WATCH_POLL_S if timeout is None else min(WATCH_POLL_S, timeout))
+            current = self._scan()
+            changed = {
+                p for p in current.keys() | self.snapshot.keys()
+                if current.get(p) != self.snapshot.get(p)
+            }
+            self.snapshot = current
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+
+class _InotifyWatcher:
+    """
+    Linux inotify through libc, one watch per directory.  Directories
+    created later are watched as they appear.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM  = 0x00000040
+    IN_MOVED_TO    = 0x00000080
+    IN_CREATE      = 0x00000100
+    IN_DELETE      = 0x00000200
+    IN_ISDIR       = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, roots: list[Path]):
+        import ctypes
+        import ctypes.util
+
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        for root in roots:
+            self._watch_tree(root)
+
+    def _watch_tree(self, root: Path):
+        for d in [root, *(p for p in root.rglob("*") if p.is_dir())]:
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(d), self.MASK)
+            if wd >= 0:
+                self.dirs[wd] = d
+
+    def wait(self, timeout: float = None) -> set[Path]:
+        """Paths changed, created or removed; empty once timeout (seconds) expires."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            parent = self.dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = parent / os.fsdecode(name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self._watch_tree(path)
+                continue
+            changed.add(path)
+        return changed
+
+
+def _make_watcher(roots: list[Path]):
+    if sys.platform.startswith("linux"):
+        try:
+            return _InotifyWatcher(roots), "inotify"
+        except (OSError, AttributeError):
+            pass
+    return _PollingWatcher(roots), "polling"
+
+
+def _wait_debounced(watcher) -> set[Path]:
+    """Block until something changes, then keep collecting until it goes quiet."""
+    changed = watcher.wait()
+    while True:
+        more = watcher.wait(WATCH_DEBOUNCE_S)
+        if not more:
+            return changed
+        changed |= more
+
+
+def sync_site_reference(pages=None, removed=()) -> int:
+    """
+    Mirror docs/ into SITE_REFERENCE, copying only files whose content
+    differs so the dev server reloads just those.  With pages=None the
+    whole tree is mirrored (stale files deleted, the section index copied
+    from SITE_INDEX_SRC); otherwise only the given docs/ paths are copied
+    and the removed ones deleted.  Returns the number of files touched.
+    """
+    touched = 0
+
+    def copy(src: Path, dest: Path):
+        nonlocal touched
+        data = src.read_bytes()
+        if dest.is_file() and dest.read_bytes() == data:
+            return
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_bytes(data)
+        touched += 1
+
+    if pages is None:
+        pages = [p for p in MD_OUT.rglob("*") if p.is_file()]
+        keep = {SITE_REFERENCE / p.relative_to(MD_OUT) for p in pages}
+        keep.add(SITE_REFERENCE / "index.mdx")
+        if SITE_REFERENCE.exists():
+            for p in list(SITE_REFERENCE.rglob("*")):
+                if p.is_file() and p not in keep:
+                    p.unlink()
+                    make_md.remove_empty_parents(p, SITE_REFERENCE)
+                    touched += 1
+        if SITE_INDEX_SRC.is_file():
+            copy(SITE_INDEX_SRC, SITE_REFERENCE / "index.mdx")
+
+    for page in pages:
+        page = Path(page)
+        if page.is_file():
+            copy(page, SITE_REFERENCE / page.relative_to(MD_OUT))
+    for page in removed:
+        dest = SITE_REFERENCE / Path(page).relative_to(MD_OUT)
+        if dest.is_file():
+            dest.unlink()
+            make_md.remove_empty_parents(dest, SITE_REFERENCE)
+            touched += 1
+    return touched
+
+
+def watch(parsed: list[dict], use_cache: bool = True, ignore=None):
+    """
+    Live-rebuild loop after a normal build.  `parsed` is that build's
+    records; they stay in memory and are updated per changed file with
+    make_json.IncrementalParser, then make_md re-renders against its page
+    dependency manifest, which rewrites exactly the pages that used
+    something that changed.  With use_cache the parse cache is kept up to
+    date too, so the next full build starts warm.
+    """
+    src_root  = CLONE_DIR / "include"
+    roots     = [CLONE_DIR / d for d in SOURCE_DIRS if (CLONE_DIR / d).is_dir()]
+    by_file   = {Path(r["file"]): r for r in parsed}
+    inc       = make_json.IncrementalParser()
+    sig_index = make_md.FnSigIndex()
+    index     = symbols.SymbolIndex(SYMBOL_INDEX)   # open for the whole session
+    cache     = ParseCache() if use_cache else None
+    deps      = CACHE_DIR / "mdx_deps.json"
+
+    t0 = begin_step("Sync site reference", str(SITE_REFERENCE))
+    end_step(t0, f"{sync_site_reference()} file(s) updated")
+
+    watcher, kind = _make_watcher(roots)
+    safe_print(c(f"\n  ↻  watching {', '.join(str(r) for r in roots)} ({kind})"
+                 "  •  Ctrl-C to stop", CYAN))
+
+    while True:
+        changed = _wait_debounced(watcher)
+        t_event = time.perf_counter()
+
+        sources = sorted(
+            p for p in changed
+            if p.suffix in make_json.SOURCE_SUFFIXES and not make_json.should_ignore_file(p, ignore)
+        )
+        indexes = [p for p in changed if p.name == "index.mdx"]
+        renamed = any(p.name == "dir_doc_name" for p in changed)
+        if not (sources or indexes or renamed):
+            continue
+
+        reparsed = set()
+        for src in sources:
+            if src.is_file():
+                try:
+                    record = by_file[src] = inc.parse(src)
+                except Exception as e:
+                    safe_print(c(f"  ⚠  {src}: {e}", YELLOW))
+                    continue
+                reparsed.add(record["file"])
+                if cache is not None:
+                    cache.store(src, _sha256_file(src), record)
+            else:
+                by_file.pop(src, None)
+                inc.forget(src)
+        if cache is not None:
+            cache.save()
+
+        corpus = make_md.Corpus(list(by_file.values()))
+        index.update(corpus.records, changed=reparsed)
+        stats = make_md.generate_docs(corpus, deps_path=deps, progress=lambda: None,
+                                      fn_sig_index=sig_index,
+                                      tables=index.tables([r["file"] for r in corpus]))
+        pages = list(stats["rebuilt_paths"])
+
+        for index_file in indexes:
+            if index_file.is_file() and index_file.is_relative_to(src_root):
+                dest = MD_OUT / index_file.relative_to(src_root)
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(index_file, dest)
+                pages.append(dest)
+
+        if renamed:
+            synced = sync_site_reference()
+        else:
+            synced = sync_site_reference(pages, stats["removed_paths"])
+
+        ms = (time.perf_counter() - t_event) * 1000
+        what = ", ".join(p.name for p in sorted(changed))
+        if len(what) > 60:
+            what = what[:57] + "…"
+        safe_print(
+            f"  {c('↻', GREEN, BOLD)} {what}"
+            + c(f"  •  {stats['rebuilt']} page(s) rebuilt, {stats['removed']} removed, "
+                f"{synced} synced  •  {ms:.0f}ms", GRAY)
+        )
+
+
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
 def _run(cmd, **kwargs):
@@ -402,31 +1322,143 @@ def _run(cmd, **kwargs):
 
 # ── Entry point ───────────────────────────────────────────────────────────────
 
-def main():
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Build the charmos reference docs.")
+    ap.add_argument(
+        "command", nargs="?", choices=("build", "watch"), default="build",
+        help="build once (default), or build and then rebuild affected pages "
+             f"into {SITE_REFERENCE} whenever a source file changes",
+    )
+    ap.add_argument(
+        "--subprocess", action="store_true",
+        help=f"parse in `python3 make_json.py --batch` processes of {SUBPROCESS_BATCH} "
+             "files instead of the in-process worker pool; a batch that crashes is "
+             "re-run one process per file (slower; for debugging)",
+    )
+    ap.add_argument(
+        "--jobs", "-j", type=int, default=POOL_WORKERS, metavar="N",
+        help=f"worker processes for MDX rendering (default: {POOL_WORKERS})",
+    )
+    ap.add_argument(
+        "--emit-json", action="store_true",
+        help=f"also write the intermediate make_json output to {JSON_OUT} "
+             "(for debugging; the build itself keeps it in memory)",
+    )
+    ap.add_argument(
+        "--format", choices=records.FORMATS, default="json",
+        help="format of the --emit-json record files (default: json)",
+    )
+    ap.add_argument(
+        "--no-cache", action="store_true",
+        help=f"ignore and do not update the build cache in {CACHE_DIR}; "
+             "wipes docs/ and rebuilds every page",
+    )
+    ap.add_argument(
+        "--ignore", action="append", default=[], metavar="GLOB",
+        help="also skip paths matching GLOB (repeatable): matched against every run of "
+             "path components, e.g. 'tests', '*_test.c' or 'uACPI/tests'; "
+             "make_json.IGNORE_DIRS is always skipped",
+    )
+    ap.add_argument(
+        "--since", nargs="?", const="", metavar="COMMIT",
+        help="only hash, parse and re-render what changed in the charmos tree since "
+             "the commit the previous build recorded (COMMIT, if given, is checked "
+             "against it); everything else is reused from the build cache",
+    )
+    source = ap.add_mutually_exclusive_group()
+    source.add_argument(
+        "--local", type=Path, metavar="PATH",
+        help=f"build from an existing charmos checkout or worktree in place "
+             f"(linked as {CLONE_DIR}); nothing is fetched",
+    )
+    source.add_argument(
+        "--offline", action="store_true",
+        help=f"use {CLONE_DIR} as it is; nothing is fetched",
+    )
+    source.add_argument(
+        "--ref", default=REPO_REF,
+        help=f"branch, tag or commit of {REPO_URL} to fetch into {CLONE_DIR} "
+             f"(default: {REPO_REF}); an existing checkout is updated incrementally",
+    )
+    ap.add_argument(
+        "--profile", action="store_true",
+        help="time every step, file parse, page render, make_md rewrite pass "
+             f"and record I/O; writes profile.json/profile.csv to {PROFILE_DIR} "
+             f"and prints the {PROFILE_TOP} slowest files and pages",
+    )
+    ap.add_argument(
+        "--pstats", action="store_true",
+        help=f"with --profile, also dump a cProfile .pstats file per step to {PROFILE_DIR} "
+             "(main process only)",
+    )
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    global _PROFILE
+    args = parse_args(argv)
     print_banner()
 
+    if args.profile or args.pstats:
+        _PROFILE = BuildProfile(pstats=args.pstats)
+
     t_total = time.monotonic()
 
-    # Clean previous build artefacts
+    # Clean previous build artefacts.  With the cache enabled docs/ is kept:
+    # make_md only rewrites the pages whose inputs changed.
     t0 = begin_step("Clean previous build")
-    for p in [Path("json_output"), Path("docs")]:
+    stale = [JSON_OUT] if not args.no_cache else [JSON_OUT, MD_OUT]
+    for p in stale:
         if p.exists():
             shutil.rmtree(p)
     end_step(t0)
 
-    clone_repo()
-    prepare_output_dirs()
-    run_make_json()
-    run_make_md()
-    rename_directories_from_namefiles()
-    delete_empty_markdown()
-    copy_directory_indexes()
-
-    total_elapsed = time.monotonic() - t_total
-    safe_print(
-        f"\n{c('  ✓  build complete', GREEN, BOLD)}"
-        f"  {c(f'{total_elapsed:.1f}s total', GRAY)}\n"
-    )
+    ignore  = tuple(make_json.IGNORE_DIRS) + tuple(args.ignore)
+    # A --local build's CLONE_DIR link is removed again when the build (or
+    # watch session) ends, so no later run can follow it by accident.
+    provider = source_provider(args, ignore)
+    try:
+        commit  = clone_repo(provider)
+        cache   = None if args.no_cache else ParseCache()
+        changed = None
+        if args.since is not None:
+            if cache is None:
+                fail_step("--since reuses the build cache; it cannot be combined with --no-cache")
+            changed = diff_sources(cache, args.since)
+        prepare_output_dirs(emit_json=args.emit_json or args.subprocess)
+        parsed = run_make_json(use_subprocess=args.subprocess,
+                               use_cache=not args.no_cache,
+                               emit_json=args.emit_json,
+                               fmt=args.format,
+                               commit=commit,
+                               changed=changed,
+                               ignore=ignore,
+                               cache=cache)
+        tables = update_symbol_index(parsed)
+        run_make_md(parsed, use_cache=not args.no_cache, jobs=max(1, args.jobs), tables=tables)
+        rename_directories_from_namefiles()
+        delete_empty_markdown()
+        copy_directory_indexes()
+
+        total_elapsed = time.monotonic() - t_total
+        safe_print(
+            f"\n{c('  ✓  build complete', GREEN, BOLD)}"
+            f"  {c(f'{total_elapsed:.1f}s total', GRAY)}\n"
+        )
+
+        if _PROFILE is not None:
+            _PROFILE.print_report()
+            json_path, csv_path = _PROFILE.write()
+            safe_print(c(f"\n  profile written to {json_path} and {csv_path}\n", GRAY))
+            _PROFILE = None
+
+        if args.command == "watch":
+            try:
+                watch(parsed, use_cache=not args.no_cache, ignore=ignore)
+            except KeyboardInterrupt:
+                safe_print(c("\n  stopped watching", GRAY))
+    finally:
+        provider.release()
 
 
 if __name__ == "__main__":
@@ -1,16 +1,29 @@
 #!/usr/bin/env python3
 
+import argparse
+import fnmatch
+import functools
+import multiprocessing
+import os
 import re
 import json
 import sys, shutil
+from bisect import bisect_left
 from pathlib import Path
 import tempfile
 import subprocess
-from tree_sitter import Language, Parser
+from tree_sitter import Language, Parser, Query
 from pathlib import Path
-from tree_sitter_language_pack import get_parser
+from tree_sitter_language_pack import get_language, get_parser
 from tree_sitter import Parser
 
+try:
+    from tree_sitter import QueryCursor
+except ImportError:                     # tree-sitter < 0.25
+    QueryCursor = None
+
+import records
+
 FILE_TITLE_RE = re.compile(r"/\*\s*@title:\s*(.+?)\s*\*/", re.IGNORECASE | re.DOTALL)
 
 IDEA_REF_RE = re.compile(r'\]:\s*"([^"]+)"')
@@ -22,8 +35,13 @@ FUNC_REF_RE = re.compile(r"`([a-zA-Z_][a-zA-Z0-9_]*)\(\)`", re.UNICODE)
 IGNORED_KEYWORDS = {"if", "for", "while", "switch", "return", "sizeof"}
 COMMIT_RE = re.compile(r"(?:\*?\s*)commit\s+([0-9a-f]{7,40})", re.IGNORECASE)
 
+# Paths never parsed.  Entries are fnmatch globs matched against every run
+# of consecutive path components: "uACPI" skips that directory anywhere,
+# "*_test.c" a file name, "uACPI/tests" a nested directory.
 IGNORE_DIRS = ["uACPI", "flanterm"]
 
+SOURCE_SUFFIXES = (".c", ".h")
+
 parser = get_parser("c")
 
 
@@ -80,11 +98,67 @@ def extract_metadata(md_text: str):
     return {"name": name, "status": status, "author": author}
 
 
-def should_ignore_file(path: Path):
-    for d in IGNORE_DIRS:
-        if d in path.parts:
-            return True
-    return False
+def ignore_regex(patterns=None):
+    """One compiled regex fully matching any of patterns (default IGNORE_DIRS), or None."""
+    return _ignore_regex(tuple(IGNORE_DIRS if patterns is None else patterns))
+
+
+@functools.lru_cache(maxsize=None)
+def _ignore_regex(patterns: tuple):
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+
+def _ignored_tail(rx, parts: list) -> bool:
+    # Only the runs ending at the last component; callers walking a tree
+    # have already checked the shorter prefixes.
+    return any(rx.match("/".join(parts[i:])) for i in range(len(parts)))
+
+
+def should_ignore_file(path: Path, patterns=None) -> bool:
+    rx = ignore_regex(patterns)
+    if rx is None:
+        return False
+    parts = Path(path).parts
+    return any(_ignored_tail(rx, parts[:j]) for j in range(1, len(parts) + 1))
+
+
+def iter_source_files(roots, patterns=None):
+    """
+    Yield every .c/.h file under roots, walking with os.scandir and never
+    descending into an ignored directory.  Files come out as the walk
+    finds them: a directory's own files (in scandir order) before those
+    of its subdirectories, like Path.rglob().  Symlinked directories are
+    not followed, except for the roots themselves.
+    """
+    rx = ignore_regex(patterns)
+
+    def walk(path: str, parts: list):
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            return
+        subdirs = []
+        for entry in entries:
+            sub = parts + [entry.name]
+            if rx is not None and _ignored_tail(rx, sub):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append((entry.path, sub))
+                elif entry.name.endswith(SOURCE_SUFFIXES) and entry.is_file():
+                    yield Path(entry.path)
+            except OSError:
+                continue
+        for sub_path, sub in subdirs:
+            yield from walk(sub_path, sub)
+
+    for root in roots:
+        root = Path(root)
+        if root.is_dir() and not should_ignore_file(root, patterns):
+            yield from walk(str(root), list(root.parts))
 
 
 def get_full_return_type(type_node, declarator_node, code_bytes):
@@ -223,20 +297,51 @@ def extract_function_qualifiers(node, code_bytes):
 
 
 def is_function_prototype(declarator):
+    """
+    True if declarator declares a function (`f(void)`, `*f(void)`) rather
+    than a variable — including a function pointer like `(*fp)(void)`.
+    """
     node = declarator
-    while node:
-        if node.type == "function_declarator":
-            return True
-        next_node = None
-        for field in ("declarator", "inner", "child"):
-            child = node.child_by_field_name(field)
-            if child:
-                next_node = child
-                break
-        if not next_node:
-            return False
-        node = next_node
-    return False
+    while node is not None and node.type == "pointer_declarator":
+        node = node.child_by_field_name("declarator")
+    if node is None or node.type != "function_declarator":
+        return False
+    inner = node.child_by_field_name("declarator")
+    return inner is not None and inner.type == "identifier"
+
+
+def declarator_identifier(declarator):
+    """The identifier node a (possibly pointer/array/function) declarator names."""
+    node = declarator
+    while node is not None and node.type != "identifier":
+        inner = node.child_by_field_name("declarator")
+        if inner is None and node.type == "parenthesized_declarator":
+            inner = node.named_children[0] if node.named_children else None
+        node = inner
+    return node
+
+
+def declared_type(type_node, declarator_node, ident, code_bytes):
+    """
+    Full type of a declarator: the base type plus the declarator with its
+    name cut out, e.g. `char *`, `int [4]`, `void (*)(int)`.
+    """
+    base = node_text(type_node, code_bytes) or ""
+    if type_node is not None and type_node.type in kind_map:
+        # `struct foo { ... } bar;` — the type is `struct foo`, not its body.
+        if type_node.child_by_field_name("body") is not None:
+            tag = node_text(type_node.child_by_field_name("name"), code_bytes)
+            base = f"{kind_map[type_node.type]} {tag}" if tag else kind_map[type_node.type]
+    rest = (
+        code_bytes[declarator_node.start_byte : ident.start_byte]
+        + code_bytes[ident.end_byte : declarator_node.end_byte]
+    ).decode("utf-8")
+    rest = re.sub(r"\s+", " ", rest).strip()
+    if not rest:
+        return base
+    if rest.startswith("*"):
+        return f"{base} {rest.replace(' ', '')}"
+    return f"{base} {rest}"
 
 
 def node_text(node, code):
@@ -250,6 +355,11 @@ def node_text(node, code):
     return text
 
 
+def node_text_raw(node, code):
+    """Exact source text of node, without node_text()'s whitespace folding."""
+    return code[node.start_byte : node.end_byte].decode("utf-8")
+
+
 # ---------------------------------------------------------------------------
 # Nested-aware struct collection
 # ---------------------------------------------------------------------------
@@ -292,7 +402,9 @@ def collect_struct_recursive(node, code, seen_ids=None):
     if seen_ids is None:
         seen_ids = set()
 
-    node_id = id(node)
+    # Key on the syntax node, not the wrapper: wrappers are short-lived, so
+    # id() values get reused and unrelated nested composites were dropped.
+    node_id = node.id
     if node_id in seen_ids:
         return None
     seen_ids.add(node_id)
@@ -410,181 +522,407 @@ def extract_fn_ptr_info(type_node, declarator_node, code):
     return {"return_type": ret_type.strip(), "parameters": parameters}
 
 
-def parse_c_types_and_functions(filename):
-
+def read_source(filename):
+    """Read a source file once and parse it.  Returns (code_bytes, tree)."""
     code = Path(filename).read_bytes()
-    tree = parser.parse(code)
-    root = tree.root_node
+    return code, parser.parse(code)
 
-    functions = []
-    structs = []
-    enums = []
-    typedefs = []
-    globals_vars = []
-    defines = []
 
-    # Track node ids we have already recorded so we don't double-count
-    # struct/enum nodes that appear both as a top-level declaration and
-    # as the type inside a typedef.
-    recorded_struct_ids = set()
-    recorded_enum_ids = set()
+def parse_c_types_and_functions(filename, engine="walk"):
+    code, tree = read_source(filename)
+    return collect_c_parse(tree.root_node, code, engine)
 
-    def visit(node):
 
-        if node.type == "function_definition":
+def collect_c_parse(root, code, engine="walk"):
+    """
+    Build the c_parse dict (functions, types, defines) from a parse tree
+    with one of C_PARSE_ENGINES; both give identical output.
+    """
+    return C_PARSE_ENGINES[engine](root, code)
 
-            decl = node.child_by_field_name("declarator")
-            type_node = node.child_by_field_name("type")
 
-            name, params = extract_function_name_and_params(decl, code)
+class CParseCollector:
+    """
+    Accumulates the c_parse dict (functions, types, defines) one syntax
+    node at a time.  Both extraction engines below feed the same collector
+    so their output is identical by construction; they only differ in how
+    they find the nodes.
+    """
 
-            functions.append(
-                {
-                    "name": name,
-                    "return_type": node_text(type_node, code),
-                    "parameters": params,
-                    "line": node.start_point[0] + 1,
-                }
+    def __init__(self, code):
+        self.code = code
+        self.functions = []
+        self.structs = []
+        self.enums = []
+        self.typedefs = []
+        self.globals_vars = []
+        self.defines = []
+
+        # Track node ids we have already recorded so we don't double-count
+        # struct/enum nodes that appear both as a top-level declaration and
+        # as the type inside a typedef.  Node.id identifies the underlying
+        # syntax node; Python's id() of the wrapper object does not, since
+        # a fresh wrapper is created (and freed) for every node visited.
+        self.recorded_struct_ids = set()
+        self.recorded_enum_ids = set()
+
+    def add_struct(self, node):
+        nid = node.id
+        if nid not in self.recorded_struct_ids:
+            self.recorded_struct_ids.add(nid)
+            s = collect_struct_recursive(node, self.code)
+            if s and s["members"]:
+                self.structs.append(s)
+
+    def add_enum(self, node, body):
+        nid = node.id
+        if nid not in self.recorded_enum_ids:
+            self.recorded_enum_ids.add(nid)
+            code = self.code
+            name = node_text(node.child_by_field_name("name"), code)
+            members = collect_enum_members(body, code)
+            self.enums.append(
+                {"name": name, "members": members, "line": node.start_point[0] + 1}
             )
 
-        elif node.type in ("struct_specifier", "union_specifier"):
-            # Only record if it has a body (i.e. is a definition, not a reference)
-            body = node.child_by_field_name("body")
-            if body is None:
-                for child in node.children:
-                    visit(child)
-                return
+    def add_function(self, node, type_node, decl):
+        name, params = extract_function_name_and_params(decl, self.code)
 
-            nid = id(node)
-            if nid not in recorded_struct_ids:
-                recorded_struct_ids.add(nid)
-                s = collect_struct_recursive(node, code)
-                if s and s["members"]:
-                    structs.append(s)
+        self.functions.append(
+            {
+                "name": name,
+                "return_type": node_text(type_node, self.code),
+                "parameters": params,
+                "qualifiers": extract_function_qualifiers(node, self.code),
+                "prototype": False,
+                "line": node.start_point[0] + 1,
+            }
+        )
 
-        elif node.type == "enum_specifier":
-            # Only record enums that have a body — bare references like
-            # `enum FOO` in a return type or parameter must be skipped.
-            body = node.child_by_field_name("body")
-            if body is None:
-                for child in node.children:
-                    visit(child)
-                return
+    def add_declaration(self, node):
+        """
+        A file-scope declaration: function prototypes go to functions,
+        every other named declarator (extern or defined) to globals.
+        Struct/enum definitions inside it are left to the caller.
+        """
+        code = self.code
+        type_node = node.child_by_field_name("type")
+        qualifiers = None
+
+        for decl in node.children_by_field_name("declarator"):
+            init = None
+            if decl.type == "init_declarator":
+                init = decl.child_by_field_name("value")
+                decl = decl.child_by_field_name("declarator")
+            if decl is None:
+                continue
 
-            nid = id(node)
-            if nid not in recorded_enum_ids:
-                recorded_enum_ids.add(nid)
-                name = node_text(node.child_by_field_name("name"), code)
-                members = collect_enum_members(body, code)
-                enums.append(
-                    {"name": name, "members": members, "line": node.start_point[0] + 1}
+            if qualifiers is None:
+                qualifiers = extract_function_qualifiers(node, code)
+            if is_function_prototype(decl):
+                name, params = extract_function_name_and_params(decl, code)
+                self.functions.append(
+                    {
+                        "name": name,
+                        "return_type": node_text(type_node, code),
+                        "parameters": params,
+                        "qualifiers": qualifiers,
+                        "prototype": True,
+                        "line": node.start_point[0] + 1,
+                    }
                 )
+                continue
 
-        elif node.type == "type_definition":
-
-            decl = node.child_by_field_name("declarator")
-            type_node = node.child_by_field_name("type")
-
-            # If the typedef wraps an anonymous/named struct or enum defined
-            # right here, make sure that definition is also recorded once.
-            if type_node and type_node.type in ("struct_specifier", "union_specifier"):
-                body = type_node.child_by_field_name("body")
-                if body is not None:
-                    nid = id(type_node)
-                    if nid not in recorded_struct_ids:
-                        recorded_struct_ids.add(nid)
-                        s = collect_struct_recursive(type_node, code)
-                        if s and s["members"]:
-                            structs.append(s)
-
-            if type_node and type_node.type == "enum_specifier":
-                body = type_node.child_by_field_name("body")
-                if body is not None:
-                    nid = id(type_node)
-                    if nid not in recorded_enum_ids:
-                        recorded_enum_ids.add(nid)
-                        ename = node_text(type_node.child_by_field_name("name"), code)
-                        emembers = collect_enum_members(body, code)
-                        enums.append(
-                            {
-                                "name": ename,
-                                "members": emembers,
-                                "line": type_node.start_point[0] + 1,
-                            }
-                        )
-
-            typedefs.append(
+            ident = declarator_identifier(decl)
+            if ident is None:
+                continue
+            self.globals_vars.append(
                 {
-                    "name": extract_typedef_name(decl, code),
-                    "type": get_typedef_type(type_node, decl, code),
-                    "fn_ptr": extract_fn_ptr_info(type_node, decl, code),
-                    "line": node.start_point[0] + 1,
+                    "name": node_text(ident, code),
+                    "type": declared_type(type_node, decl, ident, code),
+                    "initializer": node_text(init, code),
+                    "qualifiers": qualifiers,
+                    "line": decl.start_point[0] + 1,
                 }
             )
 
-        elif node.type == "preproc_def":
-            # Simple #define NAME value
-            name_node = node.child_by_field_name("name")
-            val_node  = node.child_by_field_name("value")
-            def_name  = node_text(name_node, code)
-            if def_name and def_name not in IGNORED_KEYWORDS:
-                raw_val = node_text(val_node, code) if val_node else ""
-                raw_full = node_text(node, code) or ""
-                multiline = "\\" in raw_full or "\
-" in (code[node.start_byte:node.end_byte].decode("utf-8"))
-                defines.append({
-                    "name": def_name,
-                    "params": None,
-                    "value": raw_val or "",
-                    "raw_text": raw_full,
-                    "multiline": multiline,
-                    "line": node.start_point[0] + 1,
-                })
-
-        elif node.type == "preproc_function_def":
-            # Function-like #define NAME(params...) body
-            name_node   = node.child_by_field_name("name")
-            params_node = node.child_by_field_name("parameters")
-            val_node    = node.child_by_field_name("value")
-            def_name    = node_text(name_node, code)
-            if def_name and def_name not in IGNORED_KEYWORDS:
+    def add_typedef(self, node, type_node, decl, type_body):
+        """type_body is the body of type_node when it is a struct/union/enum definition."""
+        code = self.code
+
+        # If the typedef wraps an anonymous/named struct or enum defined
+        # right here, make sure that definition is also recorded once.
+        if type_body is not None:
+            if type_node.type in ("struct_specifier", "union_specifier"):
+                self.add_struct(type_node)
+            elif type_node.type == "enum_specifier":
+                self.add_enum(type_node, type_body)
+
+        self.typedefs.append(
+            {
+                "name": extract_typedef_name(decl, code),
+                "type": get_typedef_type(type_node, decl, code),
+                "fn_ptr": extract_fn_ptr_info(type_node, decl, code),
+                "line": node.start_point[0] + 1,
+            }
+        )
+
+    def add_define(self, node, name_node, params_node, val_node, function_like):
+        """#define NAME value, or function-like #define NAME(params...) body."""
+        code = self.code
+        def_name = node_text(name_node, code)
+        if def_name and def_name not in IGNORED_KEYWORDS:
+            params_raw = None
+            if function_like:
                 params_raw = node_text(params_node, code) if params_node else "()"
-                raw_val  = node_text(val_node, code) if val_node else ""
-                raw_full = node_text(node, code) or ""
-                raw_bytes = code[node.start_byte:node.end_byte].decode("utf-8")
-                multiline = "\\" in raw_full or "\
+            raw_val  = node_text(val_node, code) if val_node else ""
+            raw_full = node_text(node, code) or ""
+            raw_bytes = code[node.start_byte:node.end_byte].decode("utf-8")
+            multiline = "\\" in raw_full or "\
 " in raw_bytes
-                defines.append({
-                    "name": def_name,
-                    "params": params_raw,
-                    "value": raw_val or "",
-                    "raw_text": raw_full,
-                    "multiline": multiline,
-                    "line": node.start_point[0] + 1,
-                })
-
-        # Recurse — but don't descend into nodes we've already handled above
-        # (struct/enum bodies are handled inside collect_struct_recursive /
-        # collect_enum_members, not by the visitor).
-        if node.type not in ("struct_specifier", "union_specifier", "enum_specifier",
-                              "type_definition", "function_definition",
-                              "preproc_def", "preproc_function_def"):
-            for child in node.children:
-                visit(child)
-
-    visit(root)
+            self.defines.append({
+                "name": def_name,
+                "params": params_raw,
+                "value": raw_val or "",
+                "raw_text": raw_full,
+                "multiline": multiline,
+                "line": node.start_point[0] + 1,
+            })
+
+    def result(self):
+        return {
+            "functions": self.functions,
+            "types": {
+                "structs": self.structs,
+                "enums": self.enums,
+                "typedefs": self.typedefs,
+                "globals": self.globals_vars,
+            },
+            "defines": self.defines,
+        }
 
-    return {
-        "functions": functions,
-        "types": {
-            "structs": structs,
-            "enums": enums,
-            "typedefs": typedefs,
-            "globals": globals_vars,
-        },
-        "defines": defines,
+
+def collect_c_parse_walk(root, code):
+    """
+    Build the c_parse dict by walking the tree in Python, pruning every
+    subtree it has handled.  The default engine.
+    """
+    out = CParseCollector(code)
+
+    def on_function_definition(node):
+        out.add_function(
+            node,
+            node.child_by_field_name("type"),
+            node.child_by_field_name("declarator"),
+        )
+
+    def on_type_definition(node):
+        type_node = node.child_by_field_name("type")
+        type_body = None
+        if type_node and type_node.type in kind_map:
+            type_body = type_node.child_by_field_name("body")
+        out.add_typedef(node, type_node, node.child_by_field_name("declarator"), type_body)
+
+    def on_preproc_def(node):
+        out.add_define(
+            node,
+            node.child_by_field_name("name"),
+            None,
+            node.child_by_field_name("value"),
+            function_like=False,
+        )
+
+    def on_preproc_function_def(node):
+        out.add_define(
+            node,
+            node.child_by_field_name("name"),
+            node.child_by_field_name("parameters"),
+            node.child_by_field_name("value"),
+            function_like=True,
+        )
+
+    # Nodes fully handled by one of these; the walker never descends into
+    # them (struct/enum bodies are handled inside collect_struct_recursive /
+    # collect_enum_members, not by the walker).
+    handlers = {
+        "function_definition":  on_function_definition,
+        "type_definition":      on_type_definition,
+        "preproc_def":          on_preproc_def,
+        "preproc_function_def": on_preproc_function_def,
     }
 
+    # Iterative pre-order walk with a TreeCursor: no Python recursion, so
+    # deeply nested or huge generated headers can't hit the recursion
+    # limit, and no per-level `node.children` lists are built.
+    cursor = root.walk()
+    while True:
+        node = cursor.node
+        kind = node.type
+        descend = True
+
+        handler = handlers.get(kind)
+        if handler is not None:
+            handler(node)
+            descend = False
+
+        elif kind == "declaration":
+            # Prototypes and globals.  Keep walking: a struct or enum may
+            # be defined inside it (`struct foo { ... } bar;`).
+            out.add_declaration(node)
+
+        elif kind in ("struct_specifier", "union_specifier"):
+            # Only record if it has a body (i.e. is a definition, not a
+            # reference); bare references are walked like any other node.
+            if node.child_by_field_name("body") is not None:
+                out.add_struct(node)
+                descend = False
+
+        elif kind == "enum_specifier":
+            # Only record enums that have a body — bare references like
+            # `enum FOO` in a return type or parameter must be skipped.
+            body = node.child_by_field_name("body")
+            if body is not None:
+                out.add_enum(node, body)
+                descend = False
+
+        if descend and cursor.goto_first_child():
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                break
+        else:
+            continue
+        break
+
+    return out.result()
+
+
+# ---------------------------------------------------------------------------
+# Query-based extraction
+# ---------------------------------------------------------------------------
+
+# One pattern per declaration kind the walker handles.  The outer capture
+# names the kind; the others are the fields its handler needs.  struct,
+# union and enum patterns require a body, so bare references like
+# `struct foo *` never match.
+C_PARSE_QUERY_SOURCE = """
+(function_definition
+  type: (_)? @type
+  declarator: (_) @declarator) @function
+
+(type_definition
+  type: (_) @type
+  declarator: (_) @declarator) @typedef
+
+(struct_specifier body: (_) @body) @struct
+(union_specifier body: (_) @body) @struct
+(enum_specifier body: (_) @body) @enum
+
+(preproc_def
+  name: (_) @name
+  value: (_)? @value) @define
+
+(preproc_function_def
+  name: (_) @name
+  parameters: (_)? @params
+  value: (_)? @value) @macro
+
+(declaration) @declaration
+"""
+
+# Outer capture name of each pattern above, by pattern index.
+_C_PARSE_KINDS = ("function", "typedef", "struct", "struct", "enum", "define", "macro",
+                  "declaration")
+
+# Compiled once per process (each generate.py worker imports this module
+# once), like the parser above.
+c_parse_query = Query(get_language("c"), C_PARSE_QUERY_SOURCE)
+
+
+def _query_matches(query, node):
+    if QueryCursor is not None:         # tree-sitter >= 0.25
+        return QueryCursor(query).matches(node)
+    return query.matches(node)
+
+
+def _capture(caps, name):
+    """First node captured under name (captures are lists on newer bindings)."""
+    found = caps.get(name)
+    if isinstance(found, list):
+        return found[0] if found else None
+    return found
+
+
+def collect_c_parse_query(root, code):
+    """
+    Build the c_parse dict with c_parse_query.  Matching runs in
+    tree-sitter's C query engine; Python only sees the declarations and
+    their fields.  Output is identical to collect_c_parse_walk: the walker
+    doesn't descend into a declaration it has handled, so matches nested
+    inside an earlier match (locals in function bodies, a typedef's own
+    struct) are dropped here, and the rest are handled in source order.
+
+    The query can't prune, so every nested match still gets a Python node
+    wrapper; on these bindings that makes it slower than the walker on
+    sources with many function bodies or nested anonymous members.
+    """
+    decls = {}
+    for pattern, caps in _query_matches(c_parse_query, root):
+        kind = _C_PARSE_KINDS[pattern]
+        node = _capture(caps, kind)
+        prev = decls.get(node.id)
+        if prev is not None:
+            # `typedef struct foo a, *b;` matches once per declarator; the
+            # walker only ever sees the first one.
+            first = _capture(prev[2], "declarator")
+            decl = _capture(caps, "declarator")
+            if first is None or decl is None or first.start_byte <= decl.start_byte:
+                continue
+        decls[node.id] = (node, kind, caps)
+
+    # A typedef's own struct/enum definition is nested inside it, so it is
+    # skipped below; the typedef handler records it through this table.
+    bodies = {
+        node.id: _capture(caps, "body")
+        for node, kind, caps in decls.values()
+        if kind in ("struct", "enum")
+    }
+
+    out = CParseCollector(code)
+    covered_to = -1
+    for node, kind, caps in sorted(
+        decls.values(), key=lambda d: (d[0].start_byte, -d[0].end_byte)
+    ):
+        if node.start_byte < covered_to:
+            continue
+        if kind == "declaration":
+            # The walker handles declarations but still descends into them.
+            out.add_declaration(node)
+            continue
+        covered_to = node.end_byte
+
+        if kind == "function":
+            out.add_function(node, _capture(caps, "type"), _capture(caps, "declarator"))
+        elif kind == "typedef":
+            type_node = _capture(caps, "type")
+            out.add_typedef(node, type_node, _capture(caps, "declarator"),
+                            bodies.get(type_node.id))
+        elif kind == "struct":
+            out.add_struct(node)
+        elif kind == "enum":
+            out.add_enum(node, _capture(caps, "body"))
+        else:
+            out.add_define(node, _capture(caps, "name"), _capture(caps, "params"),
+                           _capture(caps, "value"), function_like=kind == "macro")
+
+    return out.result()
+
+
+C_PARSE_ENGINES = {
+    "walk":  collect_c_parse_walk,
+    "query": collect_c_parse_query,
+}
+
 
 def extract_commits(md_text: str):
     commits = []
@@ -631,67 +969,119 @@ def extract_audience(md_text: str):
     return "\n".join(cleaned_lines), audience
 
 
-def extract_ideas_from_file(path):
-    ideas = []
+def iter_comments(root):
+    """Yield every comment node under root, in document order."""
+    cursor = root.walk()
+    while True:
+        node = cursor.node
+        if node.type == "comment":
+            yield node
+        elif cursor.goto_first_child():
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return
 
-    with open(path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
 
-    full_text = "".join(lines)
-    idx = 0
-    while idx < len(lines):
-        line = lines[idx].strip()
-        m = IDEA_SIGNATURE_RE.match(line)
-        if m:
-            size, name = m.groups()
-            start_idx = idx + 1
-            content_lines = []
+def _source_lines(text: str) -> list:
+    """Split like readlines(): on "\n" only, keeping the line endings."""
+    parts = text.split("\n")
+    lines = [p + "\n" for p in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
 
-            while start_idx < len(lines):
-                l = lines[start_idx].rstrip()
-                content_lines.append(l)
-                if l.strip().endswith("*/"):
-                    start_idx += 1
-                    break
-                start_idx += 1
 
-            raw_text = "\n".join(content_lines)
-            md_text = clean_comment_markers(raw_text)
+def _decode_source(code: bytes) -> str:
+    # Match what text-mode open() gives: universal newlines
+    return code.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
 
-            remaining_text = "\n".join(lines[start_idx:])
 
-            refs = extract_refs(md_text, remaining_text)
+def extract_title_from_comments(comments, code: bytes):
+    """The @title of the first comment carrying one, else None."""
+    for node in comments:
+        title = extract_file_title(node_text_raw(node, code))
+        if title:
+            return title
+    return None
 
-            md_text, audience = extract_audience(md_text)
-            metadata = extract_metadata(md_text)
-            if audience:
-                metadata["audience"] = audience
 
-            refs["bugs"] = extract_bugs(md_text)
-            refs["commits"] = extract_commits(md_text)
-            refs["idea_refs"] = extract_idea_refs(md_text)
+def extract_ideas_from_comments(comments, code: bytes, path):
+    """
+    Find @idea blocks among the comment nodes of one parse tree.
 
-            ideas.append(
-                {
-                    "path": str(path),
-                    "name": name.strip(),
-                    "size": size,
-                    "start_line": idx + 1,
-                    "end_line": start_idx,
-                    "raw_text": raw_text,
-                    "content_md": md_text,
-                    "metadata": metadata,
-                    "references": refs,
-                }
-            )
+    An idea is a one-line signature comment
 
-            idx = start_idx
-        else:
-            idx += 1
+        /* @idea:big Some name */
+
+    whose body is the next comment.  The idea text is every source line
+    after the signature up to and including the line the body comment ends
+    on, so start/end lines are exact wherever the comments sit on the line.
+    """
+    ideas = []
+    comments = list(comments)
+    lines = _source_lines(_decode_source(code))
+
+    # extract_refs() for an idea covers all the code after it.  Scan the file
+    # once up front; each idea then takes the suffix of that scan.
+    refs_scan = RefScanner("\n".join(lines))
+    line_offsets = [0]
+    for l in lines:
+        line_offsets.append(line_offsets[-1] + len(l) + 1)
+
+    i = 0
+    while i < len(comments):
+        sig = comments[i]
+        m = IDEA_SIGNATURE_RE.match(node_text_raw(sig, code).strip())
+        if not m:
+            i += 1
+            continue
+
+        size, name = m.groups()
+        sig_row = sig.start_point[0]
+        body = comments[i + 1] if i + 1 < len(comments) else None
+        end_row = body.end_point[0] if body is not None else sig.end_point[0]
+
+        content_lines = [l.rstrip() for l in lines[sig.end_point[0] + 1 : end_row + 1]]
+        raw_text = "\n".join(content_lines)
+        md_text = clean_comment_markers(raw_text)
+
+        refs = _collect_refs(md_text, refs_scan, line_offsets[min(end_row + 1, len(lines))])
+
+        md_text, audience = extract_audience(md_text)
+        metadata = extract_metadata(md_text)
+        if audience:
+            metadata["audience"] = audience
+
+        refs["bugs"] = extract_bugs(md_text)
+        refs["commits"] = extract_commits(md_text)
+        refs["idea_refs"] = extract_idea_refs(md_text)
+
+        ideas.append(
+            {
+                "path": str(path),
+                "name": name.strip(),
+                "size": size,
+                "start_line": sig_row + 1,
+                "end_line": end_row + 1,
+                "raw_text": raw_text,
+                "content_md": md_text,
+                "metadata": metadata,
+                "references": refs,
+            }
+        )
+
+        # The body comment is consumed along with its signature
+        i += 2
 
     return ideas
 
 
+def extract_ideas_from_file(path):
+    code, tree = read_source(path)
+    return extract_ideas_from_comments(iter_comments(tree.root_node), code, path)
+
+
 # Unicode non-breaking space — survives remark/MDX rendering unchanged,
 # unlike regular spaces which HTML collapses.
 NBSP = "\u00a0"
@@ -783,48 +1173,90 @@ def clean_comment_markers(raw: str) -> str:
     return "\n".join(cleaned)
 
 
-def extract_refs(md_text: str, code_text: str):
-    import re
+# Every character str.splitlines() treats as a line break once universal
+# newlines have turned \r and \r\n into \n.
+_LINE_BREAK_RE = re.compile("[\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
 
-    combined_text = md_text + "\n" + code_text
-    lines = combined_text.splitlines()
 
-    char_to_line = []
-    offset = 0
-    for i, line in enumerate(lines, 1):
-        for _ in line:
-            char_to_line.append(i)
-        char_to_line.append(i)
-        offset += len(line) + 1
+class RefScanner:
+    """
+    Function/file references and line breaks of one text, found in a single
+    scan.  The references of any suffix of the text (the code after an
+    idea block) are then a bisect away instead of a rescan, and line
+    numbers come from the sorted line-break offsets rather than a
+    per-character table.
+
+    Neither pattern can match across a line break, so the matches of a
+    suffix starting at a line boundary are exactly the whole-text matches
+    at or after it.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.breaks = [m.start() for m in _LINE_BREAK_RE.finditer(text)]
+        self.functions = [
+            (m.start(), m.end(), m.group(1))
+            for m in FUNC_REF_RE.finditer(text)
+            if m.group(1) not in IGNORED_KEYWORDS
+        ]
+        self.files = [(m.start(), m.end(), m.group(1)) for m in FILE_RE.finditer(text)]
+        self._function_starts = [f[0] for f in self.functions]
+        self._file_starts = [f[0] for f in self.files]
+
+    def line_at(self, idx: int, start: int = 0) -> int:
+        """1-based line of idx within the suffix of the text beginning at start."""
+        return bisect_left(self.breaks, idx) - bisect_left(self.breaks, start) + 1
+
+    def functions_from(self, start: int):
+        return self.functions[bisect_left(self._function_starts, start):]
+
+    def files_from(self, start: int):
+        return self.files[bisect_left(self._file_starts, start):]
+
+
+def _collect_refs(md_text: str, code: RefScanner, code_start: int = 0):
+    """
+    References in md_text + "\n" + code.text[code_start:], with indices and
+    line numbers relative to that combined text.
+    """
+    md = RefScanner(md_text)
+    # The code part starts after md_text and the joining newline
+    base = len(md_text) + 1
+    base_line = len(md.breaks) + 1
 
     functions = []
-    FUNC_REF_RE = re.compile(r"`([a-zA-Z_][a-zA-Z0-9_]*)\(\)`")
-    for match in FUNC_REF_RE.finditer(combined_text):
-        name = match.group(1)
-        if name not in IGNORED_KEYWORDS:
-            start_idx = match.start()
-            line_number = (
-                char_to_line[start_idx] if start_idx < len(char_to_line) else 1
-            )
-            functions.append(
-                {
-                    "name": name,
-                    "start_idx": start_idx,
-                    "end_idx": match.end(),
-                    "line": line_number,
-                }
-            )
+    for start, end, name in md.functions:
+        functions.append(
+            {"name": name, "start_idx": start, "end_idx": end, "line": md.line_at(start)}
+        )
+    for start, end, name in code.functions_from(code_start):
+        functions.append(
+            {
+                "name": name,
+                "start_idx": base + start - code_start,
+                "end_idx": base + end - code_start,
+                "line": base_line + code.line_at(start, code_start),
+            }
+        )
 
-    FILE_RE = re.compile(r"([./\w\-]+?\.(c|h|rs|cpp|txt|md))")
-    files = []
-    for match in FILE_RE.finditer(combined_text):
+    files = [{"name": name, "start_idx": start, "end_idx": end}
+             for start, end, name in md.files]
+    for start, end, name in code.files_from(code_start):
         files.append(
-            {"name": match.group(1), "start_idx": match.start(), "end_idx": match.end()}
+            {
+                "name": name,
+                "start_idx": base + start - code_start,
+                "end_idx": base + end - code_start,
+            }
         )
 
     return {"functions": functions, "files": files}
 
 
+def extract_refs(md_text: str, code_text: str):
+    return _collect_refs(md_text, RefScanner(code_text))
+
+
 def write_ideas_to_json(ideas, out_path):
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump(ideas, f, indent=2, ensure_ascii=False)
@@ -862,35 +1294,452 @@ def extract_bugs(md_text: str):
     return bugs
 
 
-def main():
-    if len(sys.argv) != 3:
-        print(f"Usage: {sys.argv[0]} <input_file> <output_json>")
-        sys.exit(1)
+def build_file_record(input_file: Path, engine: str = "walk") -> dict:
+    """
+    Parse one source file into the record written to its JSON output:
+    file path, @title, c_parse tables and @idea blocks.
+    """
+    # One read, one parse: title and ideas come from the tree's comment
+    # nodes, the C declarations from the rest of it.
+    code, tree = read_source(input_file)
+    root = tree.root_node
+    comments = list(iter_comments(root))
 
-    input_file = Path(sys.argv[1])
-    output_json = Path(sys.argv[2])
+    title = extract_title_from_comments(comments, code)
+    ideas = extract_ideas_from_comments(comments, code, input_file)
+    type_info = collect_c_parse(root, code, engine)
 
+    return {
+        "file": str(input_file),
+        "title": title,
+        "c_parse": type_info,
+        "ideas": ideas,
+    }
+
+
+def process_file(input_file: Path, output_json: Path = None, fmt: str = "json",
+                 engine: str = "walk"):
+    """
+    Parse input_file and return its record, also writing it to output_json
+    (in records.FORMATS format fmt) when one is given.  Returns None (and
+    writes nothing) for files under IGNORE_DIRS.
+
+    This is the entry point used by generate.py's in-process worker pool,
+    which imports this module once per worker so the module-level parser
+    is reused across files.
+    """
     if should_ignore_file(input_file):
-        sys.exit(0)
+        return None
 
-    if not input_file.is_file():
-        print(f"Error: {input_file} does not exist or is not a file.")
-        sys.exit(1)
+    record = build_file_record(input_file, engine)
+    if output_json is not None:
+        if fmt == "json":
+            write_ideas_to_json(record, output_json)
+        else:
+            records.write_record(record, output_json, fmt)
+    return record
 
-    full_text = Path(input_file).read_text(encoding="utf-8")
 
-    title = extract_file_title(full_text)
-    ideas = extract_ideas_from_file(input_file)
-    type_info = parse_c_types_and_functions(str(input_file))
+# ---------------------------------------------------------------------------
+# Incremental reparsing
+# ---------------------------------------------------------------------------
 
-    output = {
-        "file": str(input_file),
-        "title": title,
-        "c_parse": type_info,
-        "ideas": ideas,
+def _common_prefix(a: memoryview, b: memoryview) -> int:
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: memoryview, b: memoryview, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _byte_point(code: bytes, offset: int) -> tuple:
+    row = code.count(b"\n", 0, offset)
+    return row, offset - (code.rfind(b"\n", 0, offset) + 1)
+
+
+def diff_edit(old: bytes, new: bytes):
+    """
+    The single edit turning old into new, as tree.edit() keyword
+    arguments: everything between the common prefix and the common suffix
+    is treated as replaced.  Returns None when the two are identical.
+    """
+    if old == new:
+        return None
+    a, b = memoryview(old), memoryview(new)
+    start = _common_prefix(a, b)
+    tail = _common_suffix(a, b, min(len(old), len(new)) - start)
+    old_end, new_end = len(old) - tail, len(new) - tail
+    return {
+        "start_byte": start,
+        "old_end_byte": old_end,
+        "new_end_byte": new_end,
+        "start_point": _byte_point(old, start),
+        "old_end_point": _byte_point(old, old_end),
+        "new_end_point": _byte_point(new, new_end),
     }
 
-    write_ideas_to_json(output, output_json)
+
+def _shift_lines(obj, delta: int):
+    """Copy of a c_parse fragment with every "line" moved by delta."""
+    if isinstance(obj, dict):
+        return {
+            k: v + delta if k == "line" and isinstance(v, int) else _shift_lines(v, delta)
+            for k, v in obj.items()
+        }
+    if isinstance(obj, list):
+        return [_shift_lines(v, delta) for v in obj]
+    return obj
+
+
+def _merge_c_parse(parts: list) -> dict:
+    merged = {
+        "functions": [],
+        "types": {"structs": [], "enums": [], "typedefs": [], "globals": []},
+        "defines": [],
+    }
+    for part in parts:
+        merged["functions"].extend(part["functions"])
+        merged["defines"].extend(part["defines"])
+        for key, items in part["types"].items():
+            merged["types"][key].extend(items)
+    return merged
+
+
+class IncrementalParser:
+    """
+    Keeps the source, parse tree and per-declaration c_parse of every file
+    it has parsed, for long-running watch loops.
+
+    parse(path) returns the same record as build_file_record().  When the
+    file was parsed before, the byte difference becomes one tree.edit(),
+    tree-sitter reparses reusing the old tree, and only the top-level
+    declarations that overlap the edit or tree-sitter's changed ranges are
+    extracted again; every other one is reused from last time, its line
+    numbers shifted.  The walker handles the root's children independently,
+    so the merged result is what a full collect_c_parse() would produce.
+    """
+
+    def __init__(self, engine: str = "walk"):
+        self.engine = engine
+        self.files = {}
+        # What the last parse() did: "bytes_edited", "decls_reused",
+        # "decls_extracted", and "incremental" (False on a first parse).
+        self.last = {}
+
+    def forget(self, path):
+        self.files.pop(str(path), None)
+
+    def parse(self, path) -> dict:
+        key = str(path)
+        code = Path(path).read_bytes()
+        state = self.files.get(key)
+
+        changed = []
+        if state is None:
+            tree = parser.parse(code)
+            previous = {}
+            edited = len(code)
+        else:
+            old_code, old_tree, previous = state
+            edit = diff_edit(old_code, code)
+            if edit is None:
+                tree = old_tree
+                edited = 0
+            else:
+                old_tree.edit(**edit)
+                tree = parser.parse(code, old_tree)
+                changed = [(r.start_byte, r.end_byte) for r in old_tree.changed_ranges(tree)]
+                changed.append((edit["start_byte"], edit["new_end_byte"]))
+                edited = max(edit["old_end_byte"], edit["new_end_byte"]) - edit["start_byte"]
+
+        collect = C_PARSE_ENGINES[self.engine]
+        decls = {}
+        parts = []
+        reused = 0
+        for child in tree.root_node.children:
+            text = code[child.start_byte:child.end_byte]
+            line = child.start_point[0]
+            dkey = (child.type, text)
+            hit = previous.get(dkey)
+            dirty = any(child.start_byte <= end and child.end_byte >= start
+                        for start, end in changed)
+            if hit is not None and not dirty:
+                old_line, part = hit
+                if old_line != line:
+                    part = _shift_lines(part, line - old_line)
+                reused += 1
+            else:
+                part = collect(child, code)
+            decls[dkey] = (line, part)
+            parts.append(part)
+
+        self.files[key] = (code, tree, decls)
+        self.last = {
+            "incremental": state is not None,
+            "bytes_edited": edited,
+            "decls_reused": reused,
+            "decls_extracted": len(parts) - reused,
+        }
+
+        root = tree.root_node
+        comments = list(iter_comments(root))
+        return {
+            "file": str(path),
+            "title": extract_title_from_comments(comments, code),
+            "c_parse": _merge_c_parse(parts),
+            "ideas": extract_ideas_from_comments(comments, code, path),
+        }
+
+
+def watch(src_dirs, out_dir: Path, fmt: str = "json", interval: float = 0.2):
+    """
+    Daemon mode: keep every .c/.h under src_dirs parsed in memory and
+    rewrite a file's record in out_dir whenever it changes on disk, using
+    IncrementalParser.  Runs until interrupted.
+    """
+    import time
+
+    inc = IncrementalParser()
+    seen = {}
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    def record_path(src: Path) -> Path:
+        return out_dir / records.record_name(src, fmt)
+
+    first = True
+    while True:
+        current = {src: src.stat().st_mtime_ns for src in iter_source_files(src_dirs)}
+
+        for src in seen.keys() - current.keys():
+            inc.forget(src)
+            record_path(src).unlink(missing_ok=True)
+            print(f"removed  {src}")
+
+        for src, mtime in current.items():
+            if seen.get(src) == mtime:
+                continue
+            t0 = time.perf_counter()
+            record = inc.parse(src)
+            records.write_record(record, record_path(src), fmt)
+            if not first:
+                ms = (time.perf_counter() - t0) * 1000
+                stats = inc.last
+                print(f"updated  {src}  {ms:.1f}ms  "
+                      f"({stats['decls_extracted']} decls re-extracted, "
+                      f"{stats['decls_reused']} reused)")
+
+        if first:
+            print(f"watching {len(current)} files")
+            first = False
+        seen = current
+        time.sleep(interval)
+
+
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+
+def batch_sources(paths, patterns=None, rejected=None):
+    """
+    Sources named on the command line: files as given, directories
+    expanded with iter_source_files(), and @LISTFILE read as one such
+    path per line (only here, not in single-file mode, so a legacy
+    input_file may start with "@").  No paths means NDJSON on stdin,
+    one path per line, either a JSON string or an object with a "file"
+    key; a line that is neither is taken as a bare path, so the output of
+    `find` can be piped in too.
+
+    A stdin line that cannot be read as a path is reported on stderr as
+    "<line>: <error>" and appended to rejected (if given); the rest of the
+    batch goes on.
+    """
+    if not paths:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] in "\"{":
+                try:
+                    item = json.loads(line)
+                    src = Path(item["file"] if isinstance(item, dict) else item)
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"{line}: {type(e).__name__}: {e}", file=sys.stderr)
+                    if rejected is not None:
+                        rejected.append(line)
+                    continue
+                yield src
+            else:
+                yield Path(line)
+        return
+    for p in paths:
+        if str(p).startswith("@"):
+            listed = [Path(line) for line in
+                      Path(str(p)[1:]).read_text(encoding="utf-8").splitlines() if line]
+            if listed:
+                yield from batch_sources(listed, patterns, rejected)
+        elif p.is_dir():
+            yield from iter_source_files([p], patterns)
+        else:
+            yield p
+
+
+def _batch_parse(job):
+    """(source, NDJSON line or None, error or None) for one batch job."""
+    src, out, fmt, engine, patterns = job
+    try:
+        if should_ignore_file(src, patterns):
+            return src, None, None
+        if not src.is_file():
+            return src, None, "does not exist or is not a file"
+        record = build_file_record(src, engine)
+        if out is not None:
+            records.write_record(record, out, fmt)
+            return src, None, None
+        return src, json.dumps(record, ensure_ascii=False), None
+    except Exception as e:
+        return src, None, f"{type(e).__name__}: {e}"
+
+
+def parse_batch(sources, out_dir: Path = None, stream=None, fmt: str = "json",
+                engine: str = "walk", jobs: int = 1, patterns=None) -> int:
+    """
+    Parse every source in one interpreter (or a pool of `jobs`), writing
+    each record to out_dir under its records.record_name(), or as one
+    NDJSON line to stream, in input order.  Ignored sources are skipped
+    silently; failures are reported on stderr as "<source>: <error>".
+    Returns the number of failures.
+    """
+    if out_dir is not None:
+        out_dir.mkdir(parents=True, exist_ok=True)
+    work = (
+        (src, out_dir / records.record_name(src, fmt) if out_dir is not None else None,
+         fmt, engine, patterns)
+        for src in sources
+    )
+
+    pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+    try:
+        results = pool.imap(_batch_parse, work, chunksize=4) if pool else map(_batch_parse, work)
+        failed = 0
+        for src, line, error in results:
+            if error is not None:
+                print(f"{src}: {error}", file=sys.stderr)
+                failed += 1
+            elif line is not None:
+                stream.write(line + "\n")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return failed
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Parse C source files into make_json records.",
+        usage="%(prog)s input_file output_json [--format F] [--engine E] [--watch]\n"
+              "       %(prog)s --batch [SOURCE | DIR | @LISTFILE ...] "
+              "(--out-dir DIR | --ndjson [PATH]) [--jobs N]",
+    )
+    ap.add_argument(
+        "paths", nargs="*", type=Path, metavar="PATH",
+        help="input_file output_json (with --watch: source and record directories); "
+             "with --batch: any number of sources, directories and @files listing "
+             "one path per line, or none to read NDJSON paths from stdin",
+    )
+    ap.add_argument(
+        "--format", choices=records.FORMATS, default="json",
+        help="output format (default: json; packed is smaller and faster to load)",
+    )
+    ap.add_argument(
+        "--engine", choices=C_PARSE_ENGINES, default="walk",
+        help="C declaration extraction engine (default: walk; output is identical)",
+    )
+    ap.add_argument(
+        "--watch", action="store_true",
+        help="keep every source under input_file parsed in memory and rewrite "
+             "records in output_json as files change, reparsing incrementally",
+    )
+    ap.add_argument(
+        "--batch", action="store_true",
+        help="parse every PATH in this one process (see --jobs)",
+    )
+    ap.add_argument(
+        "--out-dir", type=Path, metavar="DIR",
+        help="with --batch: write one record per source into DIR, named like "
+             "generate.py's json_output/",
+    )
+    ap.add_argument(
+        "--ndjson", nargs="?", const="-", metavar="PATH",
+        help="with --batch: write all records as NDJSON, one per line in input "
+             "order, to PATH (default: stdout)",
+    )
+    ap.add_argument(
+        "--jobs", "-j", type=int, default=1, metavar="N",
+        help="with --batch: parse in N worker processes (default: 1)",
+    )
+    ap.add_argument(
+        "--ignore", action="append", default=[], metavar="GLOB",
+        help="also skip paths matching GLOB (repeatable; see IGNORE_DIRS)",
+    )
+    args = ap.parse_args()
+    patterns = tuple(IGNORE_DIRS) + tuple(args.ignore)
+
+    if args.batch:
+        if (args.out_dir is None) == (args.ndjson is None):
+            ap.error("--batch needs exactly one of --out-dir and --ndjson")
+        if args.ndjson is not None and args.format != "json":
+            ap.error("--ndjson always writes JSON; --format only applies to --out-dir")
+        rejected = []
+        sources  = batch_sources(args.paths, patterns, rejected)
+        if args.ndjson is None:
+            failed = parse_batch(sources, out_dir=args.out_dir, fmt=args.format,
+                                 engine=args.engine, jobs=max(1, args.jobs), patterns=patterns)
+        elif args.ndjson == "-":
+            failed = parse_batch(sources, stream=sys.stdout, engine=args.engine,
+                                 jobs=max(1, args.jobs), patterns=patterns)
+        else:
+            with open(args.ndjson, "w", encoding="utf-8") as stream:
+                failed = parse_batch(sources, stream=stream, engine=args.engine,
+                                     jobs=max(1, args.jobs), patterns=patterns)
+        sys.exit(1 if failed or rejected else 0)
+
+    if len(args.paths) != 2:
+        ap.error("expected input_file and output_json (or --batch)")
+    input_file, output_json = args.paths
+
+    if args.watch:
+        if not input_file.is_dir():
+            print(f"Error: {input_file} is not a directory.")
+            sys.exit(1)
+        try:
+            watch([input_file], output_json, args.format)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if should_ignore_file(input_file, patterns):
+        sys.exit(0)
+
+    if not input_file.is_file():
+        print(f"Error: {input_file} does not exist or is not a file.")
+        sys.exit(1)
+
+    process_file(input_file, output_json, args.format, args.engine)
 
 
 if __name__ == "__main__":
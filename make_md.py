@@ -1,14 +1,28 @@
 #!/usr/bin/env python3
+import argparse
+import bisect
+import functools
+import hashlib
 import json
+import multiprocessing
+import os
 import sys
+import time
 import re, shutil
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
+
+import records
 
 SOURCE_REPO_URL = "https://github.com/bluegummi/charmos/blob/main"
 BUG_URL_BASE = "https://github.com/bluegummi/charmos/issues"
 DOCS_ROOT = Path("./docs")
 
+# Entries kept by each of the memoized type-resolution helpers (see
+# type_cache_stats()).  The same few thousand type strings recur on every
+# page, so this comfortably holds a whole build.
+TYPE_CACHE_SIZE = 8192
+
 IGNORED_KEYWORDS = {"if", "for", "while", "switch", "return", "sizeof"}
 
 ASIDE_MAP = {
@@ -89,12 +103,42 @@ HEADER_ICON_MAP = {
 }
 
 
+# Per-pass timings for generate.py --profile: {pass name: [calls, seconds]}
+# while generate_docs(profile=True) runs, otherwise None.  Times are
+# inclusive, so a pass that calls another also counts the inner one.
+_PASS_TIMES = None
+
+
+def timed_pass(name: str):
+    """Count calls to and time spent in the decorated function under `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _PASS_TIMES is None:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                entry = _PASS_TIMES.setdefault(name, [0, 0.0])
+                entry[0] += 1
+                entry[1] += time.perf_counter() - t0
+        return wrapper
+    return decorate
+
+
+_H2_RE          = re.compile(r"^##\s+(.*)")
+_H2_START_RE    = re.compile(r"^##\s")
+_QUOTE_PREFIX_RE = re.compile(r"^\s*>\s?")
+
+
+@timed_pass("convert_h2_to_header_with_icon")
 def convert_h2_to_header_with_icon(md: str) -> str:
     lines = md.split("\n")
     result = []
 
     for line in lines:
-        m = re.match(r"^##\s+(.*)", line)
+        m = _H2_RE.match(line)
         if m:
             title = m.group(1).strip()
             title_lower = title.lower()
@@ -115,6 +159,7 @@ def convert_h2_to_header_with_icon(md: str) -> str:
     return "\n".join(result)
 
 
+@timed_pass("convert_blockquotes_to_asides")
 def convert_blockquotes_to_asides(md: str) -> str:
     lines = md.split("\n")
     result = []
@@ -141,7 +186,7 @@ def convert_blockquotes_to_asides(md: str) -> str:
                 break
 
             # 2) End if H2 header (e.g. "## Something")
-            if re.match(r"^##\s", current):
+            if _H2_START_RE.match(current):
                 break
 
             aside_lines.append(current)
@@ -151,7 +196,7 @@ def convert_blockquotes_to_asides(md: str) -> str:
         stripped = []
         for l in aside_lines:
             if l.strip().startswith(">"):
-                stripped.append(re.sub(r"^\s*>\s?", "", l))
+                stripped.append(_QUOTE_PREFIX_RE.sub("", l))
             else:
                 stripped.append(l)
 
@@ -214,11 +259,28 @@ def make_docs_path(idea_path: str, md_root: Path = DOCS_ROOT) -> Path:
     return md_path
 
 
+def remove_empty_parents(path: Path, root: Path = DOCS_ROOT):
+    """Remove path's parent directories, innermost first, while they are empty; root itself is kept."""
+    root = Path(root)
+    parent = Path(path).parent
+    while parent != root and root in parent.parents:
+        try:
+            parent.rmdir()
+        except OSError:
+            break
+        parent = parent.parent
+
+
+_CONST_RE = re.compile(r'\bconst\b')
+_SPACE_RE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=TYPE_CACHE_SIZE)
 def normalize_type_name(type_str: str) -> str:
     type_str = type_str.strip()
-    type_str = re.sub(r'\bconst\b', '', type_str)
+    type_str = _CONST_RE.sub('', type_str)
     type_str = type_str.replace('*', '')
-    type_str = re.sub(r'\s+', ' ', type_str)
+    type_str = _SPACE_RE.sub(' ', type_str)
     type_str = type_str.replace('[]', '')
     return type_str.strip().lower()
 
@@ -243,6 +305,31 @@ REFERENCE_PREFIX = "/reference"
 SOURCE_INCLUDE_ROOT = Path("charmos/include")
 
 
+def doc_page_path(file_path, src_root: Path = SOURCE_INCLUDE_ROOT) -> Path:
+    """
+    Where a source file's page lives relative to the docs root, before
+    directory renames and without the .mdx suffix.  Headers go by their
+    path under src_root; other sources by their path in the checkout, so
+    kernel/ files land under kernel/.  Non-header sources keep their
+    extension in the name (sched_c) so a .c file and the .h next to it
+    never share a page.
+
+    e.g.  charmos/include/sch/rt_sched.h -> sch/rt_sched
+          charmos/kernel/sch/sched.c     -> kernel/sch/sched_c
+    """
+    src = Path(file_path)
+    try:
+        rel = src.relative_to(src_root)
+    except ValueError:
+        try:
+            rel = src.relative_to(src_root.parent)
+        except ValueError:
+            rel = src
+    if rel.suffix in ("", ".h"):
+        return rel.with_suffix("")
+    return rel.with_name(rel.name.replace(".", "_"))
+
+
 def _dir_name_to_slug(name: str) -> str:
     """
     Convert a human-readable dir_doc_name value to the URL slug that
@@ -258,18 +345,18 @@ def _dir_name_to_slug(name: str) -> str:
     return slug
 
 
-def build_dir_rename_map(src_root: Path = SOURCE_INCLUDE_ROOT) -> dict:
+def build_dir_name_map(src_root: Path = SOURCE_INCLUDE_ROOT) -> dict:
     """
     Walk the source include tree and collect every dir_doc_name file.
     Returns a dict mapping each directory path (relative to src_root,
-    as a tuple of path segments) to the slug that directory will have
-    on the doc site after the rename pass.
+    as a tuple of path segments) to the literal name in its dir_doc_name
+    file — i.e. the on-disk directory name the docs tree uses for it.
 
-    e.g.  ("sch",) -> "scheduling-and-multitasking"
+    e.g.  ("sch",) -> "Scheduling and Multitasking"
     """
-    rename_map = {}
+    name_map = {}
     if not src_root.exists():
-        return rename_map
+        return name_map
     for name_file in src_root.rglob("dir_doc_name"):
         parent = name_file.parent
         new_name = name_file.read_text(encoding="utf-8").strip()
@@ -282,8 +369,21 @@ def build_dir_rename_map(src_root: Path = SOURCE_INCLUDE_ROOT) -> dict:
         # Store mapping from each segment tuple to the renamed final segment
         # We only rename the *leaf* directory named by the file; ancestors
         # are resolved recursively when we build the full URL below.
-        rename_map[rel.parts] = _dir_name_to_slug(new_name)
-    return rename_map
+        name_map[rel.parts] = new_name
+    return name_map
+
+
+def build_dir_rename_map(src_root: Path = SOURCE_INCLUDE_ROOT) -> dict:
+    """
+    Like build_dir_name_map(), but maps each directory to the slug it will
+    have on the doc site after the rename pass.
+
+    e.g.  ("sch",) -> "scheduling-and-multitasking"
+    """
+    return {
+        parts: _dir_name_to_slug(name)
+        for parts, name in build_dir_name_map(src_root).items()
+    }
 
 
 def _apply_rename_map(rel_dir: Path, rename_map: dict) -> str:
@@ -307,27 +407,26 @@ def _apply_rename_map(rel_dir: Path, rename_map: dict) -> str:
 
 
 def build_type_doc_table(c_parse_map: dict, docs_root: Path,
-                         src_root: Path = SOURCE_INCLUDE_ROOT) -> dict:
+                         src_root: Path = SOURCE_INCLUDE_ROOT,
+                         rename_map: dict = None) -> dict:
     """
     Build a mapping from normalised type keys to doc-site URLs.
 
     URLs are root-relative, under REFERENCE_PREFIX, with directory segments
-    renamed according to any dir_doc_name files present in the source tree.
+    renamed according to any dir_doc_name files present in the source tree
+    (pass rename_map to reuse a build_dir_rename_map() result).
 
     e.g.  "struct rt_scheduler"
           -> /reference/scheduling-and-multitasking/rt_sched#struct-rt-scheduler
     """
-    rename_map = build_dir_rename_map(src_root)
+    if rename_map is None:
+        rename_map = build_dir_rename_map(src_root)
     doc_table  = {}
 
     for file_path, c_parse in c_parse_map.items():
-        src_path = Path(file_path)
-        try:
-            relative_path = src_path.relative_to("charmos/include")
-        except ValueError:
-            relative_path = src_path
+        relative_path = doc_page_path(file_path, src_root)
 
-        mdx_stem = relative_path.stem          # e.g. "rt_sched"
+        mdx_stem = relative_path.name          # e.g. "rt_sched"
         mdx_dir  = relative_path.parent        # e.g. Path("sch")
 
         # Apply directory renames, then prepend the reference prefix
@@ -450,6 +549,7 @@ def build_type_table(c_parse_map: dict, ignored_types=None):
     return type_table
 
 
+@functools.lru_cache(maxsize=TYPE_CACHE_SIZE)
 def generate_github_link_safe(file_path: str, line: int = None) -> str:
     src_path = Path(file_path)
     try:
@@ -464,52 +564,106 @@ def generate_github_link_safe(file_path: str, line: int = None) -> str:
     url = re.sub(r"/blob/main/charmos/", "/blob/main/", url)
     return url
 
-def load_json_dir(json_dir: Path):
-    all_ideas = []
-    c_parse_map = {}
-    for path in json_dir.glob("*.json"):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            ideas = data.get("ideas", [])
-            all_ideas.extend(ideas)
-            c_parse_map[data.get("file")] = data.get("c_parse", {})
-    return all_ideas, c_parse_map
+def _source_label(url: str) -> str:
+    """`kernel/sch/sched.c:42` for a generate_github_link_safe() URL."""
+    path, _, line = url.partition("#L")
+    path = path.split("/blob/main/", 1)[-1]
+    return f"{path}:{line}" if line else path
+
+
+class Corpus:
+    """
+    Every make_json record of one build, held in memory.
+
+    Each record is the dict make_json writes per source file — "file",
+    "title", "c_parse" and "ideas" — and is loaded exactly once.  All the
+    global tables and the per-file render loop are built from here rather
+    than by re-reading the JSON directory.
+    """
+
+    def __init__(self, records: list):
+        self.records = records
+
+    @classmethod
+    def from_json_dir(cls, json_dir: Path, fmt: str = "json") -> "Corpus":
+        return cls([
+            records.read_record(path)
+            for path in records.record_files(json_dir, fmt)
+        ])
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    @property
+    def ideas(self) -> list:
+        all_ideas = []
+        for data in self.records:
+            all_ideas.extend(data.get("ideas", []))
+        return all_ideas
+
+    @property
+    def c_parse_map(self) -> dict:
+        return {data.get("file"): data.get("c_parse", {}) for data in self.records}
+
+
+def load_json_dir(json_dir: Path, fmt: str = "json"):
+    corpus = Corpus.from_json_dir(json_dir, fmt)
+    return corpus.ideas, corpus.c_parse_map
+
+# Inline references rewritten into links in idea bodies, compiled once.
+FUNC_REF_RE   = re.compile(r'`([a-zA-Z_][a-zA-Z0-9_]*)\(\)`')
+FILE_REF_RE   = re.compile(r'`([\w./-]+\.(c|h|rs|cpp|txt|md))`')
+BUG_REF_RE    = re.compile(r'#(\d+)')
+COMMIT_REF_RE = re.compile(r'commit\s+([0-9a-f]{7,40})', re.IGNORECASE)
+
+
+def _function_link(fn, functions_map, original):
+    url = functions_map.get(fn)
+    return f"[`{fn}()`]({url})" if url else original
+
+
+def _file_link(file, files_map, original):
+    url = files_map.get(file)
+    return f"[`{file}`]({url})" if url else original
+
+
+def _bug_link(bug_number):
+    return f"[#{bug_number}]({BUG_URL_BASE}/{bug_number})"
+
+
+def _commit_link(h):
+    return f"[commit {h}](https://github.com/bluegummi/charmos/commit/{h})"
+
+
+@timed_pass("link_inline_refs")
+def link_inline_refs(md_text: str, functions_map: dict, files_map: dict) -> str:
+    """Link function, file, bug and commit references, one pass per kind."""
+    md_text = link_functions_in_md(md_text, functions_map)
+    md_text = link_files_in_md(md_text, files_map)
+    md_text = link_bugs_in_md(md_text)
+    return link_commits_in_md(md_text)
 
 def link_functions_in_md(md_text: str, functions_map: dict):
-    FUNC_RE = re.compile(r'`([a-zA-Z_][a-zA-Z0-9_]*)\(\)`')
-    def replacer(match):
-        fn = match.group(1)
-        url = functions_map.get(fn)
-        if url:
-            return f"[`{fn}()`]({url})"
-        return match.group(0)
-    return FUNC_RE.sub(replacer, md_text)
+    return FUNC_REF_RE.sub(
+        lambda m: _function_link(m.group(1), functions_map, m.group(0)), md_text)
 
 def link_files_in_md(md_text: str, files_map: dict):
-    FILE_RE = re.compile(r'`([\w./-]+\.(c|h|rs|cpp|txt|md))`')
-    def replacer(match):
-        file = match.group(1)
-        url = files_map.get(file)
-        if url:
-            return f"[`{file}`]({url})"
-        return match.group(0)
-    return FILE_RE.sub(replacer, md_text)
+    return FILE_REF_RE.sub(
+        lambda m: _file_link(m.group(1), files_map, m.group(0)), md_text)
 
 def link_commits_in_md(md_text: str):
-    COMMIT_RE = re.compile(r'commit\s+([0-9a-f]{7,40})', re.IGNORECASE)
-    def replacer(match):
-        h = match.group(1)
-        url = f"https://github.com/bluegummi/charmos/commit/{h}"
-        return f"[commit {h}]({url})"
-    return COMMIT_RE.sub(replacer, md_text)
+    return COMMIT_REF_RE.sub(lambda m: _commit_link(m.group(1)), md_text)
 
 def link_bugs_in_md(md_text: str):
-    BUG_RE = re.compile(r'#(\d+)')
-    def replacer(match):
-        bug_number = match.group(1)
-        url = f"{BUG_URL_BASE}/{bug_number}"
-        return f"[#{bug_number}]({url})"
-    return BUG_RE.sub(replacer, md_text)
+    return BUG_REF_RE.sub(lambda m: _bug_link(m.group(1)), md_text)
+
+_IDEA_TITLE_RE   = re.compile(r'^#\s*(Big|Small|Huge)\s+Idea\s*:\s*(.+)$', re.IGNORECASE)
+_IDEA_HEADING_RE = re.compile(r'^#\s*(Big|Small|Huge)\s+Idea\s*$', re.IGNORECASE)
+_CREDITS_RE      = re.compile(r'^##\s*Credits\s*$', re.IGNORECASE)
+
 
 def extract_mdx_title(md_text: str):
     lines = md_text.splitlines()
@@ -522,13 +676,13 @@ def extract_mdx_title(md_text: str):
     while idx < len(lines):
         line = lines[idx].strip()
 
-        m = re.match(r'^#\s*(Big|Small|Huge)\s+Idea\s*:\s*(.+)$', line, re.IGNORECASE)
+        m = _IDEA_TITLE_RE.match(line)
         if m:
             idea_type, idea_name = m.groups()
             idx += 1
             continue
 
-        m2 = re.match(r'^#\s*(Big|Small|Huge)\s+Idea\s*$', line, re.IGNORECASE)
+        m2 = _IDEA_HEADING_RE.match(line)
         if m2 and idx + 1 < len(lines):
             idea_type = m2.group(1)
             next_line = lines[idx + 1].strip()
@@ -537,7 +691,7 @@ def extract_mdx_title(md_text: str):
                 idx += 2
                 continue
 
-        if re.match(r'^##\s*Credits\s*$', line, re.IGNORECASE) and idx + 1 < len(lines):
+        if _CREDITS_RE.match(line) and idx + 1 < len(lines):
             credits_line = lines[idx + 1].strip()
             if credits_line:
                 credits = credits_line
@@ -561,12 +715,9 @@ def extract_mdx_title(md_text: str):
     cleaned_body = "\n".join(cleaned_lines).strip()
     return mdx_title, cleaned_body
 
-def build_json_title_index(json_dir: Path):
+def build_json_title_index(corpus: Corpus):
     index = {}
-    for jf in json_dir.glob("*.json"):
-        with open(jf, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
+    for data in corpus:
         title = data.get("title")
         src_file = data.get("file")
 
@@ -576,64 +727,227 @@ def build_json_title_index(json_dir: Path):
 
     return index
 
-def embed_idea_refs_in_md(md_text: str, idea, idea_doc_paths, json_title_index=None):
-    refs = idea.get("references", {}).get("idea_refs", [])
-    if not refs:
-        return md_text
-
-
-    for ref in refs:
-
-        ref_string = ref["string"]
-
-        ref_lower = ref_string.lower()
+def build_idea_ref_table(ideas, idea_doc_paths, json_title_index) -> dict:
+    """
+    Resolve every idea reference string used anywhere in the corpus to the
+    URL it links to (None if it names nothing).  A reference resolves to
+    the first idea whose name contains it, else to the file whose title it
+    is (case-insensitively).
+    """
+    # All idea names in one NUL-separated string: the first name containing
+    # a reference is found with a single str.find() and a bisect.
+    names = list(idea_doc_paths.items())
+    starts = []
+    offset = 0
+    for name, _ in names:
+        starts.append(offset)
+        offset += len(name) + 1
+    haystack = "\0".join(name for name, _ in names)
+
+    table = {}
+    for idea in ideas:
+        for ref in idea.get("references", {}).get("idea_refs", []):
+            ref_string = ref["string"]
+            if ref_string in table:
+                continue
+            ref_lower = ref_string.lower()
 
+            target_path = None
+            at = haystack.find(ref_lower) if names and "\0" not in ref_lower else -1
+            if at >= 0:
+                target_path = names[bisect.bisect_right(starts, at) - 1][1]
+            if not target_path and json_title_index:
+                target_path = json_title_index.get(ref_lower)
 
-        target_path = None
-        for name, path in idea_doc_paths.items():
-            if ref_lower in name:
-                target_path = path
-                break
+            table[ref_string] = generate_github_link_safe(target_path) if target_path else None
+    return table
 
-        if not target_path and json_title_index:
-            if ref_lower in json_title_index:
-                json_src = json_title_index[ref_lower]
-                link_url = generate_github_link_safe(json_src)
 
-                link_md = f'[{ref_string}]({link_url})'
+class IdeaRefLinker:
+    """
+    Aho–Corasick automaton over every resolvable idea reference string in
+    the corpus, built once per build.  embed() links one idea's references
+    in a single left-to-right pass over its body: the leftmost (then
+    longest) reference wins, and text already inside a markdown link is
+    left alone.
+    """
 
+    def __init__(self, ref_table: dict):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
 
-                pattern = re.escape(ref_string)
-                md_text = re.sub(pattern, link_md, md_text)
+        for ref_string, url in ref_table.items():
+            if not url:
                 continue
+            state = 0
+            for ch in ref_string:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = nxt
+            self.out[state] = (ref_string,)
+
+        # Breadth-first: a state's failure link is the longest proper
+        # suffix of its path that is also a trie path.
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] += self.out[self.fail[nxt]]
+
+    def find(self, text: str):
+        """Yield (start, end, ref_string) for every occurrence, overlaps included."""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for ref_string in out[state]:
+                yield i + 1 - len(ref_string), i + 1, ref_string
+
+    @timed_pass("IdeaRefLinker.embed")
+    def embed(self, md_text: str, idea, ref_table) -> str:
+        refs = idea.get("references", {}).get("idea_refs", [])
+        if not refs:
+            return md_text
+
+        links = {}
+        for ref in refs:
+            url = ref_table.get(ref["string"])
+            if url:
+                links[ref["string"]] = url
+        if not links:
+            return md_text
+
+        matches = sorted(
+            (m for m in self.find(md_text) if m[2] in links),
+            key=lambda m: (m[0], -m[1]),
+        )
+        if not matches:
+            return md_text
+
+        linked = [m.span() for m in _LINK_RE.finditer(md_text)]
+        out = []
+        pos = 0
+        span_idx = 0
+        for start, end, ref_string in matches:
+            if start < pos:
+                continue
+            while span_idx < len(linked) and linked[span_idx][1] <= start:
+                span_idx += 1
+            if span_idx < len(linked) and linked[span_idx][0] < end:
+                continue
+            out.append(md_text[pos:start])
+            out.append(f"[{ref_string}]({links[ref_string]})")
+            pos = end
+        out.append(md_text[pos:])
+        return "".join(out)
 
-        if not target_path:
-            continue
-
-
-        link_url = generate_github_link_safe(target_path)
 
-        link_md = f'[{ref_string}]({link_url})'
+def file_local_names(c_parse: dict) -> set:
+    """
+    Names of the functions and globals one file declares `static`.  They
+    are visible only inside that file, so they stay out of the global
+    tables; a definition without `static` after a static prototype is
+    file-local too.
+    """
+    entries = c_parse.get("functions", []) + c_parse.get("types", {}).get("globals", [])
+    return {e["name"] for e in entries
+            if e.get("name") and "static" in (e.get("qualifiers") or [])}
 
-        pattern = re.escape(ref_string)
-        md_text = re.sub(pattern, link_md, md_text)
 
-    return md_text
+def build_file_local_tables(data: dict) -> tuple:
+    """
+    (functions_map, globals_map) entries for one record's own file-local
+    symbols, merged like the global tables.  A page looks these up before
+    the global tables.
+    """
+    file_path = data.get("file")
+    c_parse = data.get("c_parse", {})
+    local = file_local_names(c_parse)
+    functions, prototypes, variables = {}, {}, {}
+    if not local:
+        return functions, variables
+    for f in c_parse.get("functions", []):
+        if f.get("name") in local:
+            (prototypes if f.get("prototype") else functions).setdefault(
+                f["name"], generate_github_link_safe(file_path, f.get("line")))
+    for name, url in prototypes.items():
+        functions.setdefault(name, url)
+    for g in c_parse.get("types", {}).get("globals", []):
+        if g.get("name") in local:
+            variables.setdefault(g["name"], generate_github_link_safe(file_path, g.get("line")))
+    return functions, variables
+
+
+class _FileScope:
+    """A page's view of a global symbol table: its own file's static symbols first."""
+
+    def __init__(self, local: dict, table):
+        self.local = local
+        self.table = table
+
+    def get(self, key, default=None):
+        value = self.local.get(key)
+        return value if value is not None else self.table.get(key, default)
 
 
 def build_global_function_table(c_parse_map: dict):
+    """
+    Map each function name to the source URL of its definition, merged
+    across every parsed .h and .c file.  A definition anywhere wins over
+    prototypes; a prototype is only used for functions whose definition
+    was not parsed.  `static` functions are left out (file_local_names()).
+    """
     func_table = {}
+    prototypes = {}
     for file_path, c_parse in c_parse_map.items():
+        local = file_local_names(c_parse)
         for f in c_parse.get("functions", []):
             name = f.get("name")
-            if not name:
+            if not name or name in local:
                 continue
-            if name not in func_table:
-                url = generate_github_link_safe(file_path, f.get("line"))
-                func_table[name] = url
+            table = prototypes if f.get("prototype") else func_table
+            if name not in table:
+                table[name] = generate_github_link_safe(file_path, f.get("line"))
+    for name, url in prototypes.items():
+        func_table.setdefault(name, url)
     return func_table
 
 
+def build_global_variable_table(c_parse_map: dict):
+    """
+    Map each global variable name to the source URL of its definition,
+    merged like build_global_function_table(): a non-extern declaration
+    wins over `extern` ones, and `static` globals are left out.
+    """
+    var_table = {}
+    externs = {}
+    for file_path, c_parse in c_parse_map.items():
+        local = file_local_names(c_parse)
+        for g in c_parse.get("types", {}).get("globals", []):
+            name = g.get("name")
+            if not name or name in local:
+                continue
+            table = externs if "extern" in (g.get("qualifiers") or []) else var_table
+            if name not in table:
+                table[name] = generate_github_link_safe(file_path, g.get("line"))
+    for name, url in externs.items():
+        var_table.setdefault(name, url)
+    return var_table
+
+
 def append_defines_to_md(md_lines, json_data):
     defines = json_data.get("c_parse", {}).get("defines", [])
     if not defines:
@@ -718,6 +1032,7 @@ _FN_PTR_MEMBER_RE = re.compile(
 )
 
 
+@functools.lru_cache(maxsize=TYPE_CACHE_SIZE)
 def _extract_fn_ptr_signature(m_type: str, m_name: str):
     """
     If m_name looks like a fn-ptr declarator (*foo)(...), extract a
@@ -740,45 +1055,83 @@ def _extract_fn_ptr_signature(m_type: str, m_name: str):
     return (ret_norm, tuple(param_norms))
 
 
-def _build_fn_sig_index(type_table: dict) -> dict:
-    """
-    Build a (ret_norm, (param_norms...)) -> typedef_key index from every
-    typedef entry in type_table that has fn_ptr metadata.
-    Used by strategy 3 of _resolve_member_typedef.
-    """
-    idx = {}
-    for key, entry in type_table.items():
-        fp = entry.get("type_str")  # plain typedef — no sig
-        fn_ptr = entry.get("fn_ptr") if isinstance(entry, dict) else None
-        # fn_ptr info is stored on the type_table entry if present
-        if not isinstance(entry, dict):
-            continue
-        fn_ptr = entry.get("fn_ptr")
-        if not fn_ptr:
-            continue
-        ret = normalize_type_name(fn_ptr.get("return_type") or "void")
-        params = tuple(
-            normalize_type_name((p.get("type") or "").strip())
-            for p in (fn_ptr.get("parameters") or [])
-            if (p.get("type") or "").strip() not in ("", "void")
-        )
-        idx[(ret, params)] = key
-    return idx
-
-
-# Module-level cache so we only build the sig index once per type_table object.
-_fn_sig_index_cache: tuple = (None, None)   # (type_table_id, index)
-
+def _fn_ptr_typedef_signature(fn_ptr: dict) -> tuple:
+    """The (ret_norm, (param_norms...)) signature of a typedef's fn_ptr metadata."""
+    ret = normalize_type_name(fn_ptr.get("return_type") or "void")
+    params = tuple(
+        normalize_type_name((p.get("type") or "").strip())
+        for p in (fn_ptr.get("parameters") or [])
+        if (p.get("type") or "").strip() not in ("", "void")
+    )
+    return (ret, params)
 
-def _get_fn_sig_index(type_table: dict) -> dict:
-    global _fn_sig_index_cache
-    tid = id(type_table)
-    if _fn_sig_index_cache[0] != tid:
-        _fn_sig_index_cache = (tid, _build_fn_sig_index(type_table))
-    return _fn_sig_index_cache[1]
 
+class FnSigIndex:
+    """
+    Function-pointer typedefs by normalised signature, used by strategy 3
+    of _resolve_member_typedef.  Maps (ret_norm, (param_norms...)) to the
+    type_table key of *every* typedef with that signature, ordered by
+    (file, line) so the order does not depend on how the index was built.
+
+    Built once per type_table alongside build_type_table().  A long-lived
+    process (generate.py watch) keeps one index and calls update() with
+    each new type_table; only typedefs whose entry changed are re-indexed.
+    """
 
-def _resolve_member_typedef(m_type: str, m_name: str, type_table: dict) -> tuple:
+    def __init__(self, type_table: dict = None):
+        self.candidates = {}   # signature -> [type_table key, ...]
+        self._indexed = {}     # type_table key -> (signature, entry it came from)
+        if type_table is not None:
+            self.update(type_table)
+
+    def get(self, sig, default=None):
+        return self.candidates.get(sig, default)
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def update(self, type_table: dict) -> int:
+        """Bring the index in line with type_table; returns the number of typedefs re-indexed."""
+        changed = 0
+        for key in [k for k in self._indexed if k not in type_table]:
+            self._drop(key)
+            changed += 1
+
+        touched = set()
+        for key, entry in type_table.items():
+            fn_ptr = entry.get("fn_ptr")
+            indexed = self._indexed.get(key)
+            if indexed is not None:
+                old = indexed[1]
+                if (old.get("fn_ptr") == fn_ptr and old.get("file") == entry.get("file")
+                        and old.get("line") == entry.get("line")):
+                    continue
+                self._drop(key)
+            elif not fn_ptr:
+                continue
+            changed += 1
+            if not fn_ptr:
+                continue
+            sig = _fn_ptr_typedef_signature(fn_ptr)
+            self._indexed[key] = (sig, entry)
+            self.candidates.setdefault(sig, []).append(key)
+            touched.add(sig)
+
+        for sig in touched:
+            self.candidates[sig].sort(key=lambda k: (
+                str(type_table[k].get("file")), type_table[k].get("line") or 0, k))
+        return changed
+
+    def _drop(self, key):
+        sig, _ = self._indexed.pop(key)
+        keys = self.candidates[sig]
+        keys.remove(key)
+        if not keys:
+            del self.candidates[sig]
+
+
+def _resolve_member_typedef(m_type: str, m_name: str, type_table: dict,
+                            sig_index, file_path: str = None) -> tuple:
     """
     Try to resolve a struct member to a typedef entry in type_table.
 
@@ -791,10 +1144,12 @@ def _resolve_member_typedef(m_type: str, m_name: str, type_table: dict) -> tuple
         where the member name happens to equal the typedef name.
 
     Strategy 3 — signature match:
-        parse the fn-ptr signature from m_type + m_name and compare against
-        every typedef's fn_ptr metadata.  This is the reliable path for
-        `void (*on_tick)(struct foo *);` where "on_tick" is an arbitrary
-        member name unrelated to the typedef name "on_tick_fn".
+        parse the fn-ptr signature from m_type + m_name and look it up in
+        sig_index (a FnSigIndex, or a view of its candidates).  This is the
+        reliable path for `void (*on_tick)(struct foo *);` where "on_tick"
+        is an arbitrary member name unrelated to the typedef name
+        "on_tick_fn".  When several typedefs share the signature, one from
+        file_path wins, else the first by (file, line).
 
     Returns (norm_key, entry) if found, else (None, None).
     """
@@ -816,15 +1171,16 @@ def _resolve_member_typedef(m_type: str, m_name: str, type_table: dict) -> tuple
         # Strategy 3 — signature match
         sig = _extract_fn_ptr_signature(m_type, m_name)
         if sig is not None:
-            sig_index = _get_fn_sig_index(type_table)
-            key = sig_index.get(sig)
-            if key:
+            keys = sig_index.get(sig)
+            if keys:
+                key = next((k for k in keys if type_table[k]["file"] == file_path), keys[0])
                 return key, type_table[key]
 
     return None, None
 
 
-def _collect_referenced_types(members: list, type_table: dict, doc_table: dict, file_path: str, seen: set) -> list:
+def _collect_referenced_types(members: list, type_table: dict, doc_table: dict,
+                              sig_index, file_path: str, seen: set) -> list:
     """
     Walk members recursively and collect unique external types that resolve
     in the type_table.  Returns [(display_str, url), ...] in encounter order.
@@ -839,13 +1195,14 @@ def _collect_referenced_types(members: list, type_table: dict, doc_table: dict,
         nested = m.get("nested")
         if nested:
             results.extend(_collect_referenced_types(
-                nested.get("members", []), type_table, doc_table, file_path, seen))
+                nested.get("members", []), type_table, doc_table, sig_index, file_path, seen))
             continue
 
         m_type = (m.get("type") or "").strip()
         m_name = (m.get("name") or "").strip()
 
-        norm, type_entry = _resolve_member_typedef(m_type, m_name, type_table)
+        norm, type_entry = _resolve_member_typedef(m_type, m_name, type_table,
+                                                   sig_index, file_path)
         if not norm or not type_entry:
             continue
         if norm in seen:
@@ -859,11 +1216,14 @@ def _collect_referenced_types(members: list, type_table: dict, doc_table: dict,
     return results
 
 
-def format_struct_as_c_code(data: dict, s: dict, type_table: dict, doc_table: dict = None) -> str:
+@timed_pass("format_struct_as_c_code")
+def format_struct_as_c_code(data: dict, s: dict, type_table: dict, doc_table: dict = None,
+                            sig_index=None) -> str:
     """
     Render a struct/union as a fenced ```c code block (Astro-safe) followed
     by a compact "referenced types" link list of unique external types only.
-    Nested anonymous composites are inlined in the code block.
+    Nested anonymous composites are inlined in the code block.  Pass the
+    build's FnSigIndex as sig_index; without one it is built from type_table.
     """
     name = s.get("name", "?")
     kind = s.get("kind") or "struct"
@@ -890,7 +1250,10 @@ def format_struct_as_c_code(data: dict, s: dict, type_table: dict, doc_table: di
     code_block = "```c\n" + "\n".join(code_lines) + "\n```"
 
     seen: set = set()
-    refs = _collect_referenced_types(members, type_table, doc_table or {}, file_path, seen)
+    if sig_index is None:
+        sig_index = FnSigIndex(type_table)
+    refs = _collect_referenced_types(members, type_table, doc_table or {},
+                                     sig_index, file_path, seen)
 
     if refs:
         struct_link = f"[`{name}`]({struct_url})"
@@ -957,6 +1320,7 @@ def format_typedef_fn_ptr_raw(data: dict, t: dict, type_table: dict, doc_table:
     return "".join(parts)
 
 
+@timed_pass("format_typedef_fn_ptr")
 def format_typedef_fn_ptr(data: dict, t: dict, type_table: dict, doc_table: dict = None) -> str:
     """
     Render a typedef as a fenced ```c code block followed by a referenced
@@ -1015,201 +1379,625 @@ def format_typedef_fn_ptr(data: dict, t: dict, type_table: dict, doc_table: dict
     return code_block
 
 
-def generate_docs(json_dir: Path):
-    ideas, c_parse_map = load_json_dir(json_dir)
-    type_table = build_type_table(c_parse_map)
-    doc_table  = build_type_doc_table(c_parse_map, DOCS_ROOT)
+# ---------------------------------------------------------------------------
+# Incremental rebuilds
+# ---------------------------------------------------------------------------
 
-    # Step 1: Group ideas by their source file
+def _dep_digest(value) -> str:
+    if value is None:
+        return "-"
+    blob = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
 
-    functions_map = {}
-    files_map = {}
-    idea_doc_paths = {}
-    ideas_by_file = defaultdict(list)
-    collision_counter = defaultdict(int)
-    json_files = list(json_dir.glob("*.json")) 
-    total_files = len(json_files)
-    json_title_index = build_json_title_index(json_dir)
 
-    for idea in ideas:
-        src_file = idea["path"]
-        ideas_by_file[src_file].append(idea)
-    
-    functions_map = build_global_function_table(c_parse_map)
+def _dep_key(key) -> str:
+    return key if isinstance(key, str) else json.dumps(key)
 
-    # Second pass: build function/file links
-    for idea in ideas:
-        for f in idea.get("references", {}).get("files", []):
-            files_map[f["name"]] = generate_github_link_safe(f["name"])
 
-    # Step 2: For each JSON file, write the Markdown with ideas on top
-    for i, json_file in enumerate(json_dir.glob("*.json"), start = 1):
-        with open(json_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    
-        json_title = data.get("title")
+class _TrackedTable:
+    """
+    Read-only view over one of the global lookup tables that records every
+    key a page looks up (hits *and* misses) together with a digest of the
+    value it saw.  Iterating the whole table records the "*" key, meaning
+    the page depends on the table as a whole.
 
-        source_path = Path(data["file"])
-        try:
-            relative_path = source_path.relative_to("charmos/include")
-        except ValueError:
-            relative_path = source_path
+    `digests` memoizes the digest of each (table, key) across all pages
+    of one build; the tables do not change while pages render.
+    """
+
+    def __init__(self, table: dict, name: str, log: dict, digests: dict = None):
+        self.table = table
+        self.name = name
+        self.log = log
+        self.digests = {} if digests is None else digests
+
+    def _note(self, key, value):
+        dep_key = _dep_key(key)
+        digest = self.digests.get((self.name, dep_key))
+        if digest is None:
+            digest = self.digests[(self.name, dep_key)] = _dep_digest(value)
+        self.log.setdefault(self.name, {})[dep_key] = digest
+        return value
+
+    def get(self, key, default=None):
+        value = self._note(key, self.table.get(key))
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        return self._note(key, self.table[key])
+
+    def __contains__(self, key):
+        return self._note(key, self.table.get(key)) is not None
+
+    def __bool__(self):
+        # `doc_table or {}` must keep the tracked view even when empty
+        return True
+
+    def __len__(self):
+        return len(self.table)
+
+    def items(self):
+        self._note("*", self.table)
+        return self.table.items()
+
+
+class PageDependencies:
+    """
+    Per-page record of what each generated .mdx was built from: a digest
+    of the page's own JSON, and every cross-file symbol it resolved through
+    the global tables (see _TrackedTable).
+
+    On the next run a page is rebuilt only if its JSON changed, one of its
+    recorded lookups now resolves differently, make_md.py itself changed,
+    or the output file is gone.  Untouched pages keep their mtime, so
+    Astro's content cache stays warm.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.renderer = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+        self.pages: dict = {}
+        self._lookups: dict = {}
+
+        if path.is_file():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            if data.get("renderer") == self.renderer:
+                self.pages = data.get("pages", {})
+
+    def bind(self, tables: dict):
+        """Set the current global tables used by is_fresh()."""
+        self._lookups = {}
+        for name, table in tables.items():
+            if name == "fn_sig":
+                table = {_dep_key(k): v for k, v in table.items()}
+            self._lookups[name] = table
+
+    def is_fresh(self, out_path: Path, input_digest: str) -> bool:
+        entry = self.pages.get(str(out_path))
+        if not entry or entry.get("input") != input_digest:
+            return False
+        if not out_path.is_file():
+            return False
+        for name, keys in entry.get("deps", {}).items():
+            table = self._lookups.get(name)
+            if table is None:
+                return False
+            for key, digest in keys.items():
+                current = table if key == "*" else table.get(key)
+                if _dep_digest(current) != digest:
+                    return False
+        return True
+
+    def record(self, out_path: Path, input_digest: str, log: dict):
+        self.pages[str(out_path)] = {"input": input_digest, "deps": log}
+
+    def prune(self, keep: set, root: Path = DOCS_ROOT) -> list:
+        """
+        Delete pages from previous runs whose source file is gone, and the
+        directories under root they leave empty; returns the pages' paths.
+        """
+        removed = []
+        for page in list(self.pages):
+            if page in keep:
+                continue
+            del self.pages[page]
+            p = Path(page)
+            if p.is_file():
+                p.unlink()
+                remove_empty_parents(p, root)
+                removed.append(p)
+        return removed
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"renderer": self.renderer, "pages": self.pages}),
+            encoding="utf-8",
+        )
+        tmp.replace(self.path)
+
+
+def collect_markdown_lines(data, type_table, doc_table, functions_map=None, sig_index=None):
+    lines = []
+
+    source_path = Path(data["file"])
+    file_url = generate_github_link_safe(data["file"])
+    lines.append(f"# [{source_path.as_posix()[8:]}]({file_url})\n")
+
+    # Structs — rendered as C-style monospaced blocks with inline links
+    for s in data["c_parse"]["types"].get("structs", []):
+        if not s.get("name") or s["name"].lower() == "none":
+            continue
+
+        kind = s.get("kind") or "struct"
+        s_url = generate_github_link_safe(data["file"], s.get("line"))
+        lines.append(f"### {kind} [`{s['name']}`]({s_url})\n")
+        lines.append(format_struct_as_c_code(data, s, type_table, doc_table, sig_index))
+        lines.append("\n")
+
+    # Enums — rendered as C-style monospaced blocks with inline links
+    for e in data["c_parse"]["types"].get("enums", []):
+        if not e.get("name") or e["name"].lower() == "none":
+            continue
+
+        e_url = generate_github_link_safe(data["file"], e.get("line"))
+        lines.append(f"### enum [`{e['name']}`]({e_url})\n")
+        lines.append(format_enum_as_c_code(data, e, type_table))
+        lines.append("\n")
+
+    # Typedefs
+    for t in data["c_parse"]["types"].get("typedefs", []):
+        if not t.get("name"):
+            continue
+        t_name = t["name"]
+        t_url  = generate_github_link_safe(data["file"], t.get("line"))
+        rendered = format_typedef_fn_ptr(data, t, type_table, doc_table)
+        lines.append(f"### type alias [`{t_name}`]({t_url})\n")
+        lines.append(rendered)
+        lines.append("\n")
+
+    # Functions
+    for f in data["c_parse"].get("functions", []):
+        if not f.get("name"):
+            continue
+        f_url = generate_github_link_safe(data["file"], f.get("line"))
+        rendered = format_function_signature(data, f, type_table, doc_table)
+        lines.append(f"### [`{f['name']}`]({f_url})\n")
+        lines.append(rendered)
+        if f.get("prototype") and functions_map is not None:
+            def_url = functions_map.get(f["name"])
+            if def_url and def_url != f_url:
+                lines.append(f"\nDefined in [{_source_label(def_url)}]({def_url})\n")
+        lines.append("\n")
+
+    return lines
+
+
+class RenderContext:
+    """
+    The global, read-only state every page of one build renders against:
+    the corpus itself plus the type/doc/function/file tables built from it.
+
+    Built once in the parent process.  With --jobs the worker processes are
+    forked after it exists and inherit it as-is instead of rebuilding it.
+    """
+
+    def __init__(self, corpus: Corpus, fn_sig_index: FnSigIndex = None, tables: dict = None):
+        self.corpus = corpus
+        ideas = corpus.ideas
+
+        # `tables` holds the four symbol tables already merged, as loaded
+        # from the parse stage's symbol index (symbols.SymbolIndex.tables()).
+        if tables is None:
+            c_parse_map = corpus.c_parse_map
+            tables = {
+                "type_table":    build_type_table(c_parse_map),
+                "doc_table":     build_type_doc_table(c_parse_map, DOCS_ROOT),
+                "functions_map": build_global_function_table(c_parse_map),
+                "globals_map":   build_global_variable_table(c_parse_map),
+            }
+        self.type_table = tables["type_table"]
+        self.doc_table  = tables["doc_table"]
+        self.functions_map = tables["functions_map"]
+        self.globals_map = tables["globals_map"]
+        self.json_title_index = build_json_title_index(corpus)
+        self.idea_doc_paths = {}
+        self.idea_refs = build_idea_ref_table(ideas, self.idea_doc_paths,
+                                              self.json_title_index)
+        self.idea_ref_linker = IdeaRefLinker(self.idea_refs)
+
+        # Group ideas by their source file
+        self.ideas_by_file = defaultdict(list)
+        for idea in ideas:
+            self.ideas_by_file[idea["path"]].append(idea)
+
+        # Build file links
+        self.files_map = {}
+        for idea in ideas:
+            for f in idea.get("references", {}).get("files", []):
+                self.files_map[f["name"]] = generate_github_link_safe(f["name"])
+
+        self.dir_names = build_dir_name_map()
+
+        # Built before any fork so workers share it.  A caller that keeps
+        # an index across builds (watch mode) passes it in to be updated.
+        if fn_sig_index is None:
+            fn_sig_index = FnSigIndex()
+        fn_sig_index.update(self.type_table)
+        self.fn_sig_index = fn_sig_index
+
+        # Digest of every global-table value a page has looked up so far
+        # (see _TrackedTable), shared by all pages rendered in this process.
+        self.dep_digests = {}
+
+    @property
+    def global_tables(self) -> dict:
+        return {
+            "type_table":       self.type_table,
+            "doc_table":        self.doc_table,
+            "functions_map":    self.functions_map,
+            "globals_map":      self.globals_map,
+            "files_map":        self.files_map,
+            "idea_refs":        self.idea_refs,
+            "fn_sig":           self.fn_sig_index.candidates,
+        }
+
+    def page_path(self, data: dict) -> Path:
+        relative_path = doc_page_path(data["file"])
+
+        # Pages go straight into their dir_doc_name directory so that pages
+        # kept from a previous run are found where that run left them.
+        out_dir = _apply_rename_map(relative_path.parent, self.dir_names)
+        return DOCS_ROOT / out_dir / (relative_path.name + ".mdx")
+
+
+def render_page(data: dict, ctx: RenderContext) -> tuple:
+    """
+    Render the .mdx text for one parsed source file.
+    Returns (text, dep_log) where dep_log lists every global-table lookup
+    the page made (see _TrackedTable).
+    """
+    json_title = data.get("title")
+    source_path = Path(data["file"])
+    md_out_path = ctx.page_path(data)
+
+    # Every lookup into the global tables below goes through a tracked
+    # view, so we know exactly which cross-file symbols this page used.
+    dep_log = {}
+    tracked = {
+        name: _TrackedTable(table, name, dep_log, ctx.dep_digests)
+        for name, table in ctx.global_tables.items()
+    }
+    page_type_table = tracked["type_table"]
+    page_doc_table  = tracked["doc_table"]
+
+    # The page's own static functions and globals resolve before the
+    # global tables, which leave them out.  They come from this record,
+    # whose digest already decides whether the page is rebuilt.
+    local_functions, local_globals = build_file_local_tables(data)
+    page_functions = _FileScope(local_functions, tracked["functions_map"])
+    page_globals   = _FileScope(local_globals, tracked["globals_map"])
+
+    # Gather ideas for this file
+    file_ideas = ctx.ideas_by_file.get(str(source_path), [])
+    
+    # First priority: file-level title from JSON
+    if json_title:
+        title = json_title
+        author = "Unknown"
+        status = "unknown"
+    
+    # Second priority: first idea in the file
+    elif file_ideas:
+        first_idea = file_ideas[0]
+        title = first_idea.get("name", md_out_path.stem)
+        author = first_idea.get("author", "Unknown")
+        status = first_idea.get("status", "unknown")
     
-        md_out_path = DOCS_ROOT / relative_path.parent / (relative_path.stem + ".mdx")
-        md_out_path.parent.mkdir(parents=True, exist_ok=True)
+    # Fallback: filename
+    else:
+        title = md_out_path.stem
+        author = "Unknown"
+        status = "unknown"
     
-        # Gather ideas for this file
-        file_ideas = ideas_by_file.get(str(source_path), [])
+                    
+    front_matter_lines = [
+        "---\n",
+        f'title: "{title}"\n',
+        f'author: "{author}"\n', 
+        f'status: "{status}"\n',
+        "---\n\n"
+    ]
+
+    front_matter = "".join(front_matter_lines)
+
+    combined_lines = []
+
+    only_one = len(file_ideas) == 1
+    status_added = False
+
+    for idea in file_ideas:
+        md_text = idea["content_md"]
+        mdx_title, md_body = extract_mdx_title(md_text)
+        md_body = link_inline_refs(md_body, page_functions, tracked["files_map"])
+        md_body = merge_changelog_and_notes(md_body)
+        md_body = ctx.idea_ref_linker.embed(md_body, idea, tracked["idea_refs"])
+        md_body = convert_blockquotes_to_asides(md_body)
+        md_body = convert_h2_to_header_with_icon(md_body)
+
+        idea_name = idea["name"]
+        combined_lines.append(f"# {idea['size'].capitalize()} Idea: {idea_name}\n")
+        metadata = idea.get("metadata", {})
+        author = metadata.get("author", "Unknown")
+        status = metadata.get("status", "unknown")
         
-        # First priority: file-level title from JSON
-        if json_title:
-            title = json_title
-            author = "Unknown"
-            status = "unknown"
+        status_upper = status.upper().strip()
+
+        card_icon, card_color = STATUS_CARD_MAP.get(status_upper, ("star", "gray"))
+        audience = metadata.get("audience", "General")
+        author = metadata.get("author", "Unknown")
         
-        # Second priority: first idea in the file
-        elif file_ideas:
-            first_idea = file_ideas[0]
-            title = first_idea.get("name", md_out_path.stem)
-            author = first_idea.get("author", "Unknown")
-            status = first_idea.get("status", "unknown")
+        badge_md = status_to_badge(status)
+        variant = STATUS_BADGE_MAPPING.get(status, "tip")
+        if (only_one):
+            front_matter = insert_string_at_line(front_matter, 
+                                    "sidebar:\n  badge:\n    text: " + status.capitalize() + "\n    variant: "
+                                                       + variant + "\n", 5)
+            status_added = True
         
-        # Fallback: filename
-        else:
-            title = md_out_path.stem
-            author = "Unknown"
-            status = "unknown"
+        card_md = (
+            f'<Card title="{idea_name}" icon="{card_icon}" color="{card_color}">\n'
+            f"{badge_md}  \n"
+            f"**Audience:** {audience}  \n"
+            f"**Author:** {author}\n"
+            f"</Card>\n"
+        )
         
-                        
-        front_matter_lines = [
-            "---\n",
-            f'title: "{title}"\n',
-            f'author: "{author}"\n', 
-            f'status: "{status}"\n',
-            "---\n\n"
-        ]
+        combined_lines.append(card_md)
+        combined_lines.append(md_body)
+                 
+    file_md_lines = collect_markdown_lines(data, page_type_table, page_doc_table,
+                                           page_functions, tracked["fn_sig"])
+    combined_lines.extend(file_md_lines)
+    combined_lines = append_defines_to_md(combined_lines, data)
+    combined_lines = append_globals_to_md(combined_lines, data, page_type_table, page_doc_table,
+                                          page_globals)
+
+    # Combine into a single page
+    text = front_matter + "\n".join(combined_lines)
+    line = 7
+    if status_added:
+        line = 11
+
+    text = insert_string_at_line(text, LIGHTS, line)
+    text = insert_string_at_line(text, "import { Badge } from '@astrojs/starlight/components';\n", line)
+    text = insert_string_at_line(text, "import { Card } from '@astrojs/starlight/components';\n", line)
+    text = insert_string_at_line(text, "import { Aside } from '@astrojs/starlight/components';\n", line)
+    text = insert_string_at_line(text, "import { Icon } from '@astrojs/starlight/components';\n", line)
+    text = insert_string_at_line(text, "import { Tabs, TabItem } from '@astrojs/starlight/components';\n", line)
+    return text, dep_log
+
+
+@timed_pass("page write")
+def _write_page_text(md_out_path: Path, text: str):
+    md_out_path.parent.mkdir(parents=True, exist_ok=True)
+    md_out_path.write_text(text, encoding="utf-8")
+
+
+def _write_page(ctx: RenderContext, index: int) -> tuple:
+    """Render and write one page; returns (index, dep_log, seconds taken)."""
+    t0 = time.perf_counter()
+    data = ctx.corpus.records[index]
+    md_out_path = ctx.page_path(data)
+    text, dep_log = render_page(data, ctx)
+    _write_page_text(md_out_path, text)
+    return index, dep_log, time.perf_counter() - t0
+
+
+# Pure helpers every page calls with the same arguments over and over,
+# memoized process-wide.  Lookups into the global tables themselves are
+# not cached: pages must keep recording them for PageDependencies.
+_TYPE_CACHES = {
+    "normalize_type_name": normalize_type_name,
+    "source links":        generate_github_link_safe,
+    "fn-ptr signatures":   _extract_fn_ptr_signature,
+}
 
-        front_matter = "".join(front_matter_lines)
 
-        combined_lines = []
+def type_cache_stats() -> dict:
+    """{cache name: {"hits", "misses", "size", "maxsize"}} for this process."""
+    stats = {}
+    for name, fn in _TYPE_CACHES.items():
+        info = fn.cache_info()
+        stats[name] = {"hits": info.hits, "misses": info.misses,
+                       "size": info.currsize, "maxsize": info.maxsize}
+    return stats
 
-        only_one = len(file_ideas) == 1
-        status_added = False
-    
-        for idea in file_ideas:
-            md_text = idea["content_md"]
-            mdx_title, md_body = extract_mdx_title(md_text)
-            md_body = link_functions_in_md(md_body, functions_map)
-            md_body = link_files_in_md(md_body, files_map)
-            md_body = link_bugs_in_md(md_body)
-            md_body = link_commits_in_md(md_body)
-            md_body = merge_changelog_and_notes(md_body)
-            md_body = embed_idea_refs_in_md(md_body, idea, idea_doc_paths, json_title_index)
-            md_body = convert_blockquotes_to_asides(md_body)
-            md_body = convert_h2_to_header_with_icon(md_body)
- 
-            idea_name = idea["name"]
-            combined_lines.append(f"# {idea['size'].capitalize()} Idea: {idea_name}\n")
-            metadata = idea.get("metadata", {})
-            author = metadata.get("author", "Unknown")
-            status = metadata.get("status", "unknown")
-            
-            status_upper = status.upper().strip()
-
-            card_icon, card_color = STATUS_CARD_MAP.get(status_upper, ("star", "gray"))
-            audience = metadata.get("audience", "General")
-            author = metadata.get("author", "Unknown")
-            
-            badge_md = status_to_badge(status)
-            variant = STATUS_BADGE_MAPPING.get(status, "tip")
-            if (only_one):
-                front_matter = insert_string_at_line(front_matter, 
-                                        "sidebar:\n  badge:\n    text: " + status.capitalize() + "\n    variant: "
-                                                           + variant + "\n", 5)
-                status_added = True
-            
-            card_md = (
-                f'<Card title="{idea_name}" icon="{card_icon}" color="{card_color}">\n'
-                f"{badge_md}  \n"
-                f"**Audience:** {audience}  \n"
-                f"**Author:** {author}\n"
-                f"</Card>\n"
+
+def _merge_cache_stats(total: dict, stats: dict, baseline: dict = None) -> dict:
+    """Add stats (minus the counts it inherited in baseline) into total."""
+    for name, s in stats.items():
+        base = (baseline or {}).get(name, {})
+        t = total.setdefault(name, {"hits": 0, "misses": 0, "size": 0,
+                                    "maxsize": s["maxsize"]})
+        t["hits"] += s["hits"] - base.get("hits", 0)
+        t["misses"] += s["misses"] - base.get("misses", 0)
+        t["size"] = max(t["size"], s["size"])
+    return total
+
+
+def format_type_cache_report(stats: dict) -> list:
+    """One line per cache: hit rate, calls and occupancy."""
+    lines = []
+    for name, s in stats.items():
+        calls = s["hits"] + s["misses"]
+        rate = 100 * s["hits"] / calls if calls else 0.0
+        lines.append(f"{name:<20} {rate:5.1f}% hits of {calls:>8}  "
+                     f"({s['size']}/{s['maxsize']} entries)")
+    return lines
+
+
+# Set by generate_docs() just before forking render workers; the children
+# inherit it through fork() rather than having it pickled to them.
+_RENDER_CTX = None
+
+
+def _render_worker(index: int) -> tuple:
+    index, dep_log, elapsed = _write_page(_RENDER_CTX, index)
+    return index, dep_log, elapsed, os.getpid(), type_cache_stats(), _PASS_TIMES
+
+
+def _merge_pass_times(total: dict, times: dict, baseline: dict = None) -> dict:
+    """Add one process's _PASS_TIMES (minus what it inherited) into total."""
+    for name, (calls, seconds) in (times or {}).items():
+        base_calls, base_seconds = (baseline or {}).get(name, (0, 0.0))
+        t = total.setdefault(name, {"calls": 0, "seconds": 0.0})
+        t["calls"] += calls - base_calls
+        t["seconds"] += seconds - base_seconds
+    return total
+
+
+def generate_docs(source, deps_path: Path = None, jobs: int = 1, progress=None,
+                  fn_sig_index: FnSigIndex = None, tables: dict = None,
+                  profile: bool = False):
+    """
+    Render one .mdx page per parsed source file.  `source` is either a
+    directory of make_json output or an already-loaded Corpus.
+
+    With jobs > 1 pages are rendered by a pool of forked worker processes
+    sharing the global tables.  `progress`, if given, is called once per
+    page (rendered or skipped as unchanged) instead of printing a status
+    line.  Returns {"rebuilt", "unchanged", "removed"} page counts, plus
+    the paths behind them in "rebuilt_paths" and "removed_paths" and the
+    memoization counters of every process in "type_caches".
+
+    fn_sig_index, if given, is a FnSigIndex kept from a previous call; it
+    is updated in place rather than rebuilt.  tables, if given, are the
+    prebuilt symbol tables RenderContext uses instead of building them.
+
+    With profile, stats["profile"] also holds the render time of every
+    page, the time spent in each timed_pass() across all processes and the
+    dependency-manifest I/O time; otherwise it is None.
+    """
+    global _PASS_TIMES
+
+    if profile:
+        _PASS_TIMES = {}
+    try:
+        return _generate_docs(source, deps_path, jobs, progress, fn_sig_index, tables, profile)
+    finally:
+        _PASS_TIMES = None
+
+
+def _generate_docs(source, deps_path, jobs, progress, fn_sig_index, tables, profile):
+    global _RENDER_CTX
+
+    corpus = source if isinstance(source, Corpus) else Corpus.from_json_dir(source)
+    ctx = RenderContext(corpus, fn_sig_index, tables)
+    total_files = len(corpus)
+    io_times = {}
+    page_times = {}
+
+    t0 = time.perf_counter()
+    deps = PageDependencies(deps_path) if deps_path else None
+    if deps is not None:
+        deps.bind(ctx.global_tables)
+        io_times["dependency manifest load"] = time.perf_counter() - t0
+
+    done = 0
+
+    def report(md_out_path, verb):
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress()
+        else:
+            print_single_line(f"{verb} {md_out_path}", progress = done / max(total_files, 1))
+
+    # Skip every page whose inputs are unchanged since the last run
+    written = set()
+    digests = {}
+    todo = []
+    for i, data in enumerate(corpus):
+        md_out_path = ctx.page_path(data)
+        written.add(str(md_out_path))
+        digests[i] = _dep_digest(data)
+        if deps is not None and deps.is_fresh(md_out_path, digests[i]):
+            report(md_out_path, "unchanged")
+        else:
+            todo.append(i)
+
+    def finished(index, dep_log, elapsed):
+        md_out_path = ctx.page_path(corpus.records[index])
+        page_times[str(md_out_path)] = elapsed
+        if deps is not None:
+            deps.record(md_out_path, digests[index], dep_log)
+        report(md_out_path, "compiled")
+
+    # Workers report cumulative counters, including what they inherited
+    # from this process at fork time; only their own share is added.
+    fork_baseline = None
+    fork_passes = None
+    worker_caches = {}
+    worker_passes = {}
+
+    fork_ok = "fork" in multiprocessing.get_all_start_methods()
+    if jobs > 1 and len(todo) > 1 and fork_ok:
+        _RENDER_CTX = ctx
+        fork_baseline = type_cache_stats()
+        fork_passes = {k: tuple(v) for k, v in (_PASS_TIMES or {}).items()}
+        try:
+            mp = multiprocessing.get_context("fork")
+            chunk = max(1, len(todo) // (jobs * 8))
+            with mp.Pool(jobs) as pool:
+                for index, dep_log, elapsed, pid, caches, passes in pool.imap_unordered(
+                        _render_worker, todo, chunk):
+                    worker_caches[pid] = caches
+                    worker_passes[pid] = passes
+                    finished(index, dep_log, elapsed)
+        finally:
+            _RENDER_CTX = None
+    else:
+        for index in todo:
+            finished(*_write_page(ctx, index))
+
+    type_caches = _merge_cache_stats({}, type_cache_stats())
+    for caches in worker_caches.values():
+        _merge_cache_stats(type_caches, caches, fork_baseline)
+
+    stats = {
+        "rebuilt": len(todo),
+        "unchanged": len(written) - len(todo),
+        "removed": 0,
+        "rebuilt_paths": [ctx.page_path(corpus.records[i]) for i in todo],
+        "removed_paths": [],
+        "type_caches": type_caches,
+        "profile": None,
+    }
+    if deps is not None:
+        stats["removed_paths"] = deps.prune(written)
+        stats["removed"] = len(stats["removed_paths"])
+        t0 = time.perf_counter()
+        deps.save()
+        io_times["dependency manifest save"] = time.perf_counter() - t0
+        if progress is None:
+            print_single_line(
+                f"rebuilt {stats['rebuilt']} page(s), {stats['unchanged']} unchanged, "
+                f"{stats['removed']} removed"
             )
-            
-            combined_lines.append(card_md)
-            combined_lines.append(md_body)
-                     
-        def collect_markdown_lines(json_path, type_table, doc_table):
-            data = json.loads(open(json_path, encoding="utf-8").read())
-            lines = []
-    
-            source_path = Path(data["file"])
-            file_url = generate_github_link_safe(data["file"])
-            lines.append(f"# [{source_path.as_posix()[8:]}]({file_url})\n")
-    
-            # Structs — rendered as C-style monospaced blocks with inline links
-            for s in data["c_parse"]["types"].get("structs", []):
-                if not s.get("name") or s["name"].lower() == "none":
-                    continue
+            sys.stdout.write("\n")
 
-                kind = s.get("kind") or "struct"
-                s_url = generate_github_link_safe(data["file"], s.get("line"))
-                lines.append(f"### {kind} [`{s['name']}`]({s_url})\n")
-                lines.append(format_struct_as_c_code(data, s, type_table, doc_table))
-                lines.append("\n")
-    
-            # Enums — rendered as C-style monospaced blocks with inline links
-            for e in data["c_parse"]["types"].get("enums", []):
-                if not e.get("name") or e["name"].lower() == "none":
-                    continue
+    if profile:
+        passes = _merge_pass_times({}, _PASS_TIMES)
+        for times in worker_passes.values():
+            _merge_pass_times(passes, times, fork_passes)
+        stats["profile"] = {"pages": page_times, "passes": passes, "io": io_times}
+    return stats
 
-                e_url = generate_github_link_safe(data["file"], e.get("line"))
-                lines.append(f"### enum [`{e['name']}`]({e_url})\n")
-                lines.append(format_enum_as_c_code(data, e, type_table))
-                lines.append("\n")
-    
-            # Typedefs
-            for t in data["c_parse"]["types"].get("typedefs", []):
-                if not t.get("name"):
-                    continue
-                t_name = t["name"]
-                t_url  = generate_github_link_safe(data["file"], t.get("line"))
-                rendered = format_typedef_fn_ptr(data, t, type_table, doc_table)
-                lines.append(f"### type alias [`{t_name}`]({t_url})\n")
-                lines.append(rendered)
-                lines.append("\n")
-
-            # Functions
-            for f in data["c_parse"].get("functions", []):
-                if not f.get("name"):
-                    continue
-                f_url = generate_github_link_safe(data["file"], f.get("line"))
-                rendered = format_function_signature(data, f, type_table, doc_table)
-                lines.append(f"### [`{f['name']}`]({f_url})\n")
-                lines.append(rendered)
-                lines.append("\n")
-    
-            return lines
-    
-        file_md_lines = collect_markdown_lines(json_file, type_table, doc_table)
-        combined_lines.extend(file_md_lines)
-        combined_lines = append_defines_to_md(combined_lines, data)
-        combined_lines = append_globals_to_md(combined_lines, data, type_table, doc_table)
-    
-        # Write combined Markdown to single file
-        text = front_matter + "\n".join(combined_lines)
-        line = 7
-        if status_added:
-            line = 11
-
-        text = insert_string_at_line(text, LIGHTS, line)
-        text = insert_string_at_line(text, "import { Badge } from '@astrojs/starlight/components';\n", line)
-        text = insert_string_at_line(text, "import { Card } from '@astrojs/starlight/components';\n", line)
-        text = insert_string_at_line(text, "import { Aside } from '@astrojs/starlight/components';\n", line)
-        text = insert_string_at_line(text, "import { Icon } from '@astrojs/starlight/components';\n", line)
-        text = insert_string_at_line(text, "import { Tabs, TabItem } from '@astrojs/starlight/components';\n", line)
-        md_out_path.write_text(text, encoding="utf-8")
-        print_single_line("compiled JSON " + str(json_dir) + " → " + str(md_out_path), progress = i / total_files)
 
 def insert_string_at_line(original_string, new_string, line_n):
     lines = original_string.splitlines()
@@ -1260,6 +2048,7 @@ def format_function_signature_raw(data, f, type_table, doc_table=None):
 _LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
 
 
+@timed_pass("retick_segmentwise")
 def retick_segmentwise(s: str) -> str:
     out = []
     i = 0
@@ -1308,6 +2097,7 @@ def clean_string(input_string):
     cleaned_string = ' '.join(line.lstrip() for line in input_string.splitlines())
     return cleaned_string
 
+@timed_pass("format_function_signature")
 def format_function_signature(data, f, type_table, doc_table=None):
     """
     Render a function as a fenced ```c code block followed by a referenced
@@ -1351,11 +2141,15 @@ def format_function_signature(data, f, type_table, doc_table=None):
         return code_block + "\n\n" + "\n".join(ref_lines)
     return code_block
 
+_CHANGELOG_NOTES_RE = re.compile(
+    r"(?:^|\n)##\s*(Changelog|Notes)\s*\n(.*?)(?=\n##\s|\Z)",
+    re.DOTALL
+)
+
+
+@timed_pass("merge_changelog_and_notes")
 def merge_changelog_and_notes(markdown: str) -> str:
-    section_re = re.compile(
-        r"(?:^|\n)##\s*(Changelog|Notes)\s*\n(.*?)(?=\n##\s|\Z)",
-        re.DOTALL
-    )
+    section_re = _CHANGELOG_NOTES_RE
 
     sections = dict(section_re.findall(markdown))
 
@@ -1384,8 +2178,8 @@ def merge_changelog_and_notes(markdown: str) -> str:
     return markdown
 
 
-def append_globals_to_md(md_lines, json_data, type_table, doc_table=None):
-    globals_list = json_data.get("c_parse", {}).get("globals", [])
+def append_globals_to_md(md_lines, json_data, type_table, doc_table=None, globals_map=None):
+    globals_list = json_data.get("c_parse", {}).get("types", {}).get("globals", [])
     if not globals_list:
         return md_lines
 
@@ -1407,23 +2201,57 @@ def append_globals_to_md(md_lines, json_data, type_table, doc_table=None):
 
         init_md = f" = `{init_val}`" if init_val is not None else ""
 
-        md_lines.append(f"- {type_md} {name_md}{init_md}")
+        # `extern` declarations point at the definition when it was parsed.
+        def_md = ""
+        if globals_map is not None:
+            def_url = globals_map.get(var_name)
+            if def_url and def_url != url:
+                def_md = f" — defined in [{_source_label(def_url)}]({def_url})"
+
+        md_lines.append(f"- {type_md} {name_md}{init_md}{def_md}")
 
     md_lines.append("\n---\n")
 
     return md_lines
 
 def main():
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <json_dir>")
-        sys.exit(1)
+    ap = argparse.ArgumentParser(description="Compile make_json output into MDX pages.")
+    ap.add_argument("json_dir", type=Path)
+    ap.add_argument(
+        "--deps", type=Path, metavar="MANIFEST",
+        help="page dependency manifest; only pages whose inputs changed "
+             "since the last run with the same manifest are rewritten",
+    )
+    ap.add_argument(
+        "--format", choices=records.FORMATS, default="json",
+        help="format of the record files in json_dir (default: json)",
+    )
+    ap.add_argument(
+        "--jobs", "-j", type=int, default=1, metavar="N",
+        help="render pages in N worker processes (default: 1; 0 = one per core)",
+    )
+    ap.add_argument(
+        "--symbols", type=Path, metavar="INDEX",
+        help="load the type/doc/function/global tables from a symbol index "
+             "written by generate.py instead of building them",
+    )
+    args = ap.parse_args()
 
-    json_dir = Path(sys.argv[1])
+    json_dir = args.json_dir
     if not json_dir.is_dir():
         print(f"Error: {json_dir} is not a directory")
         sys.exit(1)
 
-    generate_docs(json_dir)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    corpus = Corpus.from_json_dir(json_dir, args.format)
+    tables = None
+    if args.symbols:
+        import symbols
+        with symbols.SymbolIndex(args.symbols, readonly=True) as index:
+            tables = index.tables([data["file"] for data in corpus])
+        if tables is None:
+            print(f"warning: {args.symbols} does not match {json_dir}; building tables")
+    generate_docs(corpus, deps_path=args.deps, jobs=jobs, tables=tables)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Intermediate record formats
+───────────────────────────
+make_json produces one record per source file ({"file", "title",
+"c_parse", "ideas"}).  When those records are kept on disk they can be
+written in one of two formats:
+
+  json    pretty-printed JSON (.json) — readable, the historical default
+  packed  binary (.rec) — an 8-byte magic header followed by a pickle
+          (protocol 5) of the record with every short string interned, so
+          the member/field keys repeated thousands of times per file are
+          stored once and shared again on load
+
+Packed files are loaded with an unpickler that refuses to resolve any
+global, so only plain dicts/lists/strings/numbers can come out of them.
+
+Usage:
+  records.py convert <src> <dst> [--format json|packed]
+  records.py compare <dir>
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import pickle
+import sys
+import time
+from pathlib import Path
+
+FORMATS = {
+    "json":   ".json",
+    "packed": ".rec",
+}
+
+PACKED_MAGIC = b"CHRMREC\x01"
+
+# Strings longer than this are prose (idea bodies, raw macro text) and
+# almost never repeat, so interning them only costs time.
+_INTERN_MAX = 64
+
+
+def _intern_strings(obj):
+    if isinstance(obj, dict):
+        return {sys.intern(k): _intern_strings(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_intern_strings(v) for v in obj]
+    if isinstance(obj, str) and len(obj) <= _INTERN_MAX:
+        return sys.intern(obj)
+    return obj
+
+
+class _PlainUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"packed records cannot contain {module}.{name}")
+
+
+def dumps_packed(record) -> bytes:
+    return PACKED_MAGIC + pickle.dumps(_intern_strings(record), protocol=5)
+
+
+def loads_packed(blob: bytes):
+    if not blob.startswith(PACKED_MAGIC):
+        raise ValueError("not a packed record (bad magic)")
+    return _PlainUnpickler(io.BytesIO(blob[len(PACKED_MAGIC):])).load()
+
+
+def format_for(path: Path) -> str:
+    for fmt, suffix in FORMATS.items():
+        if path.suffix == suffix:
+            return fmt
+    raise ValueError(f"unknown record format for {path}")
+
+
+def record_name(src: Path, fmt: str = "json") -> str:
+    """
+    File name of src's record: its two parent directories and stem joined
+    by underscores, then a short hash of the whole path
+    (include/sch/sched.h -> include_sch_sched-<hash>.json).  Non-header
+    sources keep their extension (sched_c) so foo.c and foo.h in one
+    directory stay apart at a glance; the hash keeps include/mm/slab/x.h
+    and kernel/mm/slab/x.h apart.
+    """
+    src = Path(src)
+    stem = src.stem if src.suffix == ".h" else src.name.replace(".", "_")
+    digest = hashlib.sha256(str(src).encode("utf-8")).hexdigest()[:8]
+    return "_".join(list(src.parts[-3:-1]) + [stem]) + f"-{digest}" + FORMATS[fmt]
+
+
+def write_record(record, path: Path, fmt: str = "json"):
+    if fmt == "packed":
+        Path(path).write_bytes(dumps_packed(record))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+
+
+def read_record(path: Path):
+    path = Path(path)
+    if format_for(path) == "packed":
+        return loads_packed(path.read_bytes())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def record_files(directory: Path, fmt: str = "json"):
+    return Path(directory).glob("*" + FORMATS[fmt])
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def convert(src: Path, dst: Path, fmt: str) -> int:
+    """Convert one record file, or every record file in a directory."""
+    if src.is_dir():
+        dst.mkdir(parents=True, exist_ok=True)
+        count = 0
+        for other in FORMATS:
+            if other == fmt:
+                continue
+            for path in record_files(src, other):
+                write_record(read_record(path), dst / (path.stem + FORMATS[fmt]), fmt)
+                count += 1
+        return count
+
+    write_record(read_record(src), dst, fmt)
+    return 1
+
+
+def compare(directory: Path):
+    """
+    Load every .json record in directory, re-encode it in each format and
+    print total size and decode time per format.
+    """
+    records = [read_record(p) for p in record_files(directory, "json")]
+    if not records:
+        print(f"no .json records in {directory}")
+        return
+
+    encoders = {
+        "json (indent=2)": (
+            lambda r: json.dumps(r, indent=2, ensure_ascii=False).encode("utf-8"),
+            json.loads,
+        ),
+        "packed": (dumps_packed, loads_packed),
+    }
+
+    print(f"{len(records)} records from {directory}")
+    print(f"{'format':<18}{'size':>12}{'decode':>12}")
+    for name, (encode, decode) in encoders.items():
+        blobs = [encode(r) for r in records]
+        size = sum(len(b) for b in blobs)
+        t0 = time.perf_counter()
+        for b in blobs:
+            decode(b)
+        elapsed = time.perf_counter() - t0
+        print(f"{name:<18}{size / 1e6:>10.2f}MB{elapsed * 1000:>10.1f}ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert and compare make_json record formats.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    conv = sub.add_parser("convert", help="convert a record file or directory")
+    conv.add_argument("src", type=Path)
+    conv.add_argument("dst", type=Path)
+    conv.add_argument("--format", choices=FORMATS, default="packed")
+
+    cmp_ = sub.add_parser("compare", help="size/decode-time comparison of a JSON directory")
+    cmp_.add_argument("dir", type=Path)
+
+    args = ap.parse_args()
+    if args.cmd == "convert":
+        n = convert(args.src, args.dst, args.format)
+        print(f"converted {n} record(s) → {args.format}")
+    else:
+        compare(args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Persistent symbol index
+───────────────────────
+An SQLite file written by the parse stage that maps every symbol in the
+corpus — struct, union, enum, typedef, function, global — to its kind,
+file, line, source URL and (for types) doc-site URL:
+
+  symbols(key, name, kind, file, line, source_url, doc_url, decl, seq,
+          start_byte, end_byte, type_str, fn_ptr, local)
+    key    the lookup key make_md uses ("struct thread", "uint64_t",
+           "thread_wake"); indexed, so a point lookup is one B-tree probe
+    decl   1 for prototypes and `extern` globals, which lose to definitions
+    seq    position within the file, so tables merge exactly as make_md's
+           build_* functions would
+    local  1 for `static` functions and globals, which only resolve
+           inside their own file and never enter the global tables
+    the rest complete make_md's type_table entry (fn_ptr as JSON)
+
+  files(file, digest)   digest of each file's c_parse; only files whose
+                        digest changed are re-indexed on update
+  meta(key, value)      the make_md.py hash and the dir_doc_name rename map
+                        the URLs were computed with; if either changes,
+                        every file is re-indexed
+
+make_md loads its global tables from here (tables()) instead of walking
+every record's c_parse.  Other tools can open the file read-only and use
+lookup() or plain SQL.
+
+Usage:
+  symbols.py lookup <index> <name>
+  symbols.py stats <index>
+"""
+
+import argparse
+import hashlib
+import json
+import marshal
+import sqlite3
+from pathlib import Path
+
+import make_md
+
+SCHEMA_VERSION = "3"
+
+_COLUMNS = 14
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta    (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files   (file TEXT PRIMARY KEY, digest TEXT);
+CREATE TABLE IF NOT EXISTS symbols (
+    key        TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    file       TEXT NOT NULL,
+    line       INTEGER,
+    source_url TEXT,
+    doc_url    TEXT,
+    decl       INTEGER NOT NULL DEFAULT 0,
+    seq        INTEGER NOT NULL,
+    start_byte INTEGER,
+    end_byte   INTEGER,
+    type_str   TEXT,
+    fn_ptr     TEXT,
+    local      INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS symbols_key  ON symbols (key);
+CREATE INDEX IF NOT EXISTS symbols_file ON symbols (file, seq);
+"""
+
+
+def _digest(obj) -> str:
+    # marshal format 2 writes no back-references, so equal records always
+    # give equal bytes; it is several times faster than json.dumps here.
+    return hashlib.sha256(marshal.dumps(obj, 2)).hexdigest()[:16]
+
+
+def _builder_hash() -> str:
+    return hashlib.sha256(Path(make_md.__file__).read_bytes()).hexdigest()
+
+
+def file_symbols(file_path: str, c_parse: dict, rename_map: dict) -> list:
+    """
+    Index rows for one file, computed with make_md's own table builders so
+    keys, entries and URLs are exactly what make_md would have built.
+    """
+    file_url = make_md.generate_github_link_safe(file_path)
+
+    def source_url(line):
+        return file_url if line is None else f"{file_url}#L{line}"
+
+    one = {file_path: c_parse}
+    type_table = make_md.build_type_table(one)
+    doc_table = make_md.build_type_doc_table(one, make_md.DOCS_ROOT, rename_map=rename_map)
+    kinds = {
+        f"struct {s['name']}".lower(): (s.get("kind") or "struct")
+        for s in c_parse.get("types", {}).get("structs", []) if s.get("name")
+    }
+    local = make_md.file_local_names(c_parse)
+
+    rows = []
+    for key, entry in type_table.items():
+        kind = kinds.get(key, entry["kind"]) if entry["kind"] == "struct" else entry["kind"]
+        fn_ptr = entry.get("fn_ptr")
+        rows.append((key, entry["name"], kind, file_path, entry.get("line"),
+                     source_url(entry.get("line")),
+                     doc_table.get(key), 0, len(rows),
+                     entry.get("start_byte"), entry.get("end_byte"), entry.get("type_str"),
+                     json.dumps(fn_ptr) if fn_ptr is not None else None, 0))
+
+    for f in c_parse.get("functions", []):
+        if f.get("name"):
+            rows.append((f["name"], f["name"], "function", file_path, f.get("line"),
+                         source_url(f.get("line")),
+                         None, int(bool(f.get("prototype"))), len(rows),
+                         None, None, None, None, int(f["name"] in local)))
+
+    for g in c_parse.get("types", {}).get("globals", []):
+        if g.get("name"):
+            extern = "extern" in (g.get("qualifiers") or [])
+            rows.append((g["name"], g["name"], "variable", file_path, g.get("line"),
+                         source_url(g.get("line")),
+                         None, int(extern), len(rows),
+                         None, None, None, None, int(g["name"] in local)))
+    return rows
+
+
+class SymbolIndex:
+    """An open symbol index file.  Use as a context manager or call close()."""
+
+    def __init__(self, path: Path, readonly: bool = False):
+        self.path = Path(path)
+        if readonly:
+            # as_uri() percent-encodes ?, # and % so they stay part of the path
+            self.db = sqlite3.connect(self.path.resolve().as_uri() + "?mode=ro", uri=True)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(self.path)
+            self.db.executescript(_SCHEMA)
+            if self._meta("schema") != SCHEMA_VERSION:
+                self.db.executescript(
+                    "DROP TABLE symbols; DROP TABLE files; DELETE FROM meta;" + _SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def _meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # ---------------------------------------------------------------------------
+    # Writing
+    # ---------------------------------------------------------------------------
+
+    def update(self, records: list, changed=None) -> int:
+        """
+        Re-index every record whose c_parse changed since the last update.
+        records is the whole corpus; indexed files missing from it are
+        dropped.  `changed`, if given, names the only files whose records
+        can differ from the index (watch mode), so the rest are not even
+        re-digested.  Returns the number of files (re-)indexed or dropped.
+        """
+        rename_map = make_md.build_dir_rename_map()
+        meta = {
+            "schema": SCHEMA_VERSION,
+            "builder": _builder_hash(),
+            "rename_map": _digest(sorted((list(k), v) for k, v in rename_map.items())),
+        }
+        stale = any(self._meta(k) != v for k, v in meta.items())
+        known = dict(self.db.execute("SELECT file, digest FROM files"))
+
+        n = 0
+        with self.db:
+            if stale:
+                self.db.execute("DELETE FROM symbols")
+                self.db.execute("DELETE FROM files")
+                known = {}
+                changed = None
+            self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", meta.items())
+
+            present = set()
+            for record in records:
+                file_path = record.get("file")
+                present.add(file_path)
+                if changed is not None and file_path not in changed and file_path in known:
+                    continue
+                c_parse = record.get("c_parse", {})
+                digest = _digest(c_parse)
+                if known.get(file_path) == digest:
+                    continue
+                self.db.execute("DELETE FROM symbols WHERE file = ?", (file_path,))
+                self.db.executemany(
+                    f"INSERT INTO symbols VALUES ({', '.join('?' * _COLUMNS)})",
+                    file_symbols(file_path, c_parse, rename_map),
+                )
+                self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?)", (file_path, digest))
+                n += 1
+
+            for file_path in set(known) - present:
+                self.db.execute("DELETE FROM symbols WHERE file = ?", (file_path,))
+                self.db.execute("DELETE FROM files WHERE file = ?", (file_path,))
+                n += 1
+        return n
+
+    # ---------------------------------------------------------------------------
+    # Reading
+    # ---------------------------------------------------------------------------
+
+    def lookup(self, key: str) -> list:
+        """Every row for one lookup key (types by lower-cased key, e.g. "struct thread")."""
+        cur = self.db.execute(
+            "SELECT key, name, kind, file, line, source_url, doc_url, decl, local FROM symbols "
+            "WHERE key = ? ORDER BY file, seq", (key,))
+        cols = [d[0] for d in cur.description]
+        return [dict(zip(cols, row)) for row in cur]
+
+    def tables(self, files: list):
+        """
+        make_md's global tables — type_table, doc_table, functions_map and
+        globals_map — merged in the order of `files` exactly as the
+        build_* functions merge a c_parse_map.  Returns None unless the
+        index holds exactly those files.
+        """
+        indexed = {row[0] for row in self.db.execute("SELECT file FROM files")}
+        if indexed != set(files):
+            return None
+
+        per_file = {f: [] for f in files}
+        for row in self.db.execute(
+                "SELECT file, key, name, kind, line, source_url, doc_url, decl, "
+                "start_byte, end_byte, type_str, fn_ptr FROM symbols WHERE NOT local "
+                "ORDER BY file, seq"):
+            per_file[row[0]].append(row)
+
+        type_table, doc_table = {}, {}
+        functions, prototypes = {}, {}
+        variables, externs = {}, {}
+        for f in files:
+            for (_, key, name, kind, line, source_url, doc_url, decl,
+                 start_byte, end_byte, type_str, fn_ptr) in per_file[f]:
+                if kind == "function":
+                    (prototypes if decl else functions).setdefault(key, source_url)
+                    continue
+                if kind == "variable":
+                    (externs if decl else variables).setdefault(key, source_url)
+                    continue
+
+                # Rebuild the entry exactly as make_md.build_type_table() does
+                if kind == "typedef":
+                    type_table[key] = {
+                        "name": name, "full_name": name, "file": f, "line": line,
+                        "start_byte": start_byte, "end_byte": end_byte, "kind": "typedef",
+                        "type_str": type_str,
+                        "fn_ptr": json.loads(fn_ptr) if fn_ptr is not None else None,
+                    }
+                else:
+                    base = "enum" if kind == "enum" else "struct"
+                    type_table[key] = {
+                        "name": name, "full_name": f"{base} {name}", "file": f, "line": line,
+                        "start_byte": start_byte, "end_byte": end_byte, "kind": base,
+                    }
+                if doc_url:
+                    doc_table[key] = doc_url
+        for name, url in prototypes.items():
+            functions.setdefault(name, url)
+        for name, url in externs.items():
+            variables.setdefault(name, url)
+
+        return {
+            "type_table": type_table,
+            "doc_table": doc_table,
+            "functions_map": functions,
+            "globals_map": variables,
+        }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Query a symbol index written by generate.py.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    look = sub.add_parser("lookup", help="every definition/declaration of a symbol")
+    look.add_argument("index", type=Path)
+    look.add_argument("name")
+
+    stats = sub.add_parser("stats", help="symbol counts by kind")
+    stats.add_argument("index", type=Path)
+
+    args = ap.parse_args()
+    with SymbolIndex(args.index, readonly=True) as index:
+        if args.cmd == "lookup":
+            rows = index.lookup(args.name) or index.lookup(args.name.lower())
+            for r in rows:
+                decl = " (declaration)" if r["decl"] else ""
+                decl += " (static)" if r["local"] else ""
+                print(f"{r['kind']:<9} {r['name']}{decl}  {r['file']}:{r['line']}")
+                print(f"          {r['doc_url'] or r['source_url']}")
+            if not rows:
+                print(f"{args.name}: not found")
+        else:
+            n_files = index.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            print(f"{n_files} files")
+            for kind, count in index.db.execute(
+                    "SELECT kind, COUNT(*) FROM symbols GROUP BY kind ORDER BY kind"):
+                print(f"  {kind:<9}{count:>8}")
+
+
+if __name__ == "__main__":
+    main()